@@ -1,6 +1,7 @@
-import requests
 import re
 import os
+from httpsession import new_session
+from m3u import parse_m3u
 
 PLAYLIST_URLS = [
     "https://raw.githubusercontent.com/theariatv/theariatv.github.io/refs/heads/main/aria.m3u",
@@ -17,9 +18,11 @@ ALLOWED_GROUPS = [
 
 group_regex = re.compile(r'group-title="([^"]*)"')
 
+SESSION = new_session()
+
 def fetch_playlist(url):
     """Fetch playlist text and split into lines."""
-    r = requests.get(url)
+    r = SESSION.get(url)
     r.raise_for_status()
     return r.text.splitlines()
 
@@ -29,47 +32,29 @@ def get_existing_urls(file_path):
     if not os.path.exists(file_path):
         return urls
     with open(file_path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-    for i, line in enumerate(lines):
-        if line.startswith("#EXTINF") and i + 1 < len(lines):
-            urls.add(lines[i + 1].strip())
+        urls.update(channel.url for channel in parse_m3u(f, file_path))
     return urls
 
-def remap_group_title(line):
+def remap_group_title(channel):
     """Prefix allowed group-titles with 'AriaPlus -', keep all other metadata intact."""
-    match = group_regex.search(line)
-    if not match:
-        return None
-    original_group = match.group(1)
-    if original_group not in ALLOWED_GROUPS:
+    if channel.group not in ALLOWED_GROUPS:
         return None
 
-    new_line = re.sub(
-        r'group-title="[^"]*"',
-        f'group-title="AriaPlus - {original_group}"',
-        line
+    return group_regex.sub(
+        f'group-title="AriaPlus - {channel.group}"',
+        channel.extinf
     )
-    return new_line
 
-def process_playlist(lines, existing_urls):
+def process_playlist(lines, existing_urls, source):
     """Filter + remap channels, skipping already existing URLs."""
     output_lines = []
-    skip_next = False
-    for i, line in enumerate(lines):
-        line = line.strip()
-        if line.startswith("#EXTINF:"):
-            new_line = remap_group_title(line)
-            if not new_line:
-                skip_next = True
-                continue
-            # Check next line for URL
-            if i + 1 < len(lines):
-                url_line = lines[i + 1].strip()
-                if url_line not in existing_urls:
-                    output_lines.append(new_line)
-                    output_lines.append(url_line)
-                    existing_urls.add(url_line)
-            skip_next = True
+    for channel in parse_m3u(lines, source):
+        new_line = remap_group_title(channel)
+        if not new_line or channel.url in existing_urls:
+            continue
+        output_lines.append(new_line)
+        output_lines.append(channel.url)
+        existing_urls.add(channel.url)
     return output_lines
 
 def main():
@@ -80,7 +65,7 @@ def main():
     for url in PLAYLIST_URLS:
         try:
             lines = fetch_playlist(url)
-            new_entries.extend(process_playlist(lines, existing_urls))
+            new_entries.extend(process_playlist(lines, existing_urls, url))
         except Exception as e:
             print(f"⚠️ Failed to fetch {url}: {e}")
 
@@ -1,10 +1,23 @@
 import os
+import sys
+import calendar
+import glob
 import gzip
+import hashlib
+import json
 import re
-import requests
+import random
+import shutil
+import threading
 import time
+from collections import namedtuple
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlparse
 from xml.etree import ElementTree as ET
-from io import BytesIO
+from io import TextIOWrapper
+from hosthealth import HOSTS
+from httpsession import CircuitOpenError, new_session
 
 epg_sources = [
     "https://raw.githubusercontent.com/matthuisman/i.mjh.nz/refs/heads/master/Plex/all.xml",
@@ -34,7 +47,6 @@ epg_sources = [
     "https://epgshare01.online/epgshare01/epg_ripper_SG1.xml.gz",
     "https://epgshare01.online/epgshare01/epg_ripper_PL1.xml.gz",
     "https://epgshare01.online/epgshare01/epg_ripper_HK1.xml.gz",
-    "https://epgshare01.online/epgshare01/epg_ripper_FANDUEL1.xml.gz",
     "https://epgshare01.online/epgshare01/epg_ripper_GR1.xml.gz",
     "https://epgshare01.online/epgshare01/epg_ripper_PT1.xml.gz",
     "https://epgshare01.online/epgshare01/epg_ripper_BG1.xml.gz",
@@ -46,10 +58,73 @@ epg_sources = [
 
 playlist_url = "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/MergedPlaylist.m3u8"
 output_filename = "DrewLive.xml.gz"
+now_next_filename = "DrewLive.index.json"
+
+# "local" builds the tvg-id filter from the playlists in the checkout; "remote" downloads playlist_url.
+TVG_ID_SOURCE = "local"
+PLAYLIST_GLOBS = ["*.m3u8", "*.m3u"]
+
+# EPG id -> playlist tvg-id for ids that don't match a playlist tvg-id exactly.
+TVG_ID_ALIASES = {}
+# Also match ids that only agree after normalize_tvg_id (quality tokens, trailing digits
+# of the country suffix). Off by default: it renames EPG ids without anyone listing them.
+LOOSE_TVG_ID_MATCHING = False
+QUALITY_TOKENS = {"hd", "sd", "fhd", "uhd", "4k", "hevc", "h265"}
+
+CHUNK_SIZE = 64 * 1024
+GZIP_MAGIC = b"\x1f\x8b"
+
+MAX_WORKERS = 8
+MAX_PER_HOST = 4
+# Parse sources in this many worker processes; 1 parses inline on the download threads.
+PARSE_PROCESSES = os.cpu_count() or 1
+
+CACHE_DIR = "epg_cache"
+MANIFEST_FILE = os.path.join(CACHE_DIR, "manifest.json")
+TVG_INDEX_FILE = os.path.join(CACHE_DIR, "tvg_index.json")
+SHARD_VERSION = 7
+
+# Programmes outside [now - PAST_WINDOW_HOURS, now + FUTURE_WINDOW_DAYS] are pruned. The bounds
+# are widened to WINDOW_GRANULARITY so cached shards stay valid for that long.
+PAST_WINDOW_HOURS = 6
+FUTURE_WINDOW_DAYS = 3
+WINDOW_GRANULARITY = 6 * 3600
+
+XML_HEADER = "<?xml version='1.0' encoding='utf-8'?>\n<tv>\n"
+XML_FOOTER = "</tv>"
+
+_host_slots = {}
+_host_slots_lock = threading.Lock()
+
+SourceResult = namedtuple("SourceResult", "shard total kept entry cache_hit saved_bytes ids skipped")
+ParseStats = namedtuple("ParseStats", "total kept complete ids skipped pruned")
+GuideFilter = namedtuple("GuideFilter", "matcher window key")
+
+# Shared keep-alive pool with per-host adaptive timeouts and circuit breakers.
+SESSION = new_session(pool_size=MAX_WORKERS)
+
+_day_starts = {}
+_worker_filter = None
+
+class SourceClaims:
+    """Channel ids supplied by each finished source, so lower-priority sources can skip them early."""
+
+    def __init__(self):
+        self._finished = {}
+        self._lock = threading.Lock()
+
+    def publish(self, index, ids):
+        with self._lock:
+            self._finished[index] = ids
+
+    def claimed_before(self, index):
+        with self._lock:
+            earlier = [ids for other, ids in self._finished.items() if other < index]
+        return frozenset().union(*earlier)
 
 def fetch_tvg_ids_from_playlist(url):
     try:
-        r = requests.get(url, timeout=30)
+        r = SESSION.get(url, timeout=30)
         r.raise_for_status()
         ids = set(re.findall(r'tvg-id="([^"]+)"', r.text))
         print(f"✅ Loaded {len(ids)} tvg-ids from playlist")
@@ -58,60 +133,612 @@ def fetch_tvg_ids_from_playlist(url):
         print(f"❌ Failed to fetch tvg-ids from playlist: {e}")
         return set()
 
-def fetch_with_retry(url, retries=3, delay=10, timeout=30):
+def load_local_tvg_ids(patterns=PLAYLIST_GLOBS):
+    """Collect tvg-ids from the playlists in the working tree, re-reading only files whose mtime changed."""
+    try:
+        with open(TVG_INDEX_FILE, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+    next_index = {}
+    rescanned = 0
+    for path in sorted({p for pattern in patterns for p in glob.glob(pattern)}):
+        stat = os.stat(path)
+        cached = index.get(path)
+        if cached and cached["mtime"] == stat.st_mtime and cached["size"] == stat.st_size:
+            next_index[path] = cached
+            continue
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            ids = sorted(set(re.findall(r'tvg-id="([^"]+)"', f.read())))
+        next_index[path] = {"mtime": stat.st_mtime, "size": stat.st_size, "ids": ids}
+        rescanned += 1
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(TVG_INDEX_FILE + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(next_index, f)
+    os.replace(TVG_INDEX_FILE + ".tmp", TVG_INDEX_FILE)
+
+    ids = {tvg_id for entry in next_index.values() for tvg_id in entry["ids"]}
+    print(f"✅ Loaded {len(ids)} tvg-ids from {len(next_index)} local playlists ({rescanned} rescanned)")
+    return ids
+
+def normalize_tvg_id(tvg_id):
+    """Loose form of a tvg-id for alias matching: 'ESPN.HD.us2' and 'ESPN.us' both become 'espn.us'."""
+    parts = [part for part in tvg_id.lower().split(".") if part and part not in QUALITY_TOKENS]
+    if len(parts) > 1:
+        parts[-1] = parts[-1].rstrip("0123456789") or parts[-1]
+    return ".".join(parts)
+
+class TvgIdMatcher:
+    """Maps EPG ids onto playlist tvg-ids: exact match, explicit alias, then (when loose)
+    normalized alias."""
+
+    def __init__(self, ids, aliases=None, loose=False):
+        self.ids = frozenset(ids)
+        self.loose = loose
+        self.normalized = {}
+        if loose:
+            for tvg_id in sorted(self.ids):
+                self.normalized.setdefault(normalize_tvg_id(tvg_id), tvg_id)
+        self.aliases = {src: dst for src, dst in (aliases or {}).items() if dst in self.ids}
+        self._resolved = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def fingerprint(self):
+        lines = sorted(self.ids) + sorted(f"{src}={dst}" for src, dst in self.aliases.items())
+        lines.append(f"loose={self.loose}")
+        return "\n".join(lines)
+
+    def resolve(self, tvg_id):
+        """Return the playlist tvg-id this EPG id belongs to, or None."""
+        if tvg_id in self.ids:
+            return tvg_id
+        try:
+            return self._resolved[tvg_id]
+        except KeyError:
+            pass
+        match = None
+        if tvg_id:
+            match = self.aliases.get(tvg_id)
+            if match is None and self.loose:
+                match = self.normalized.get(normalize_tvg_id(tvg_id))
+        self._resolved[tvg_id] = match
+        return match
+
+def host_slot(url):
+    """Per-host semaphore so one origin never sees more than MAX_PER_HOST connections."""
+    host = urlparse(url).netloc
+    with _host_slots_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _host_slots[host] = threading.BoundedSemaphore(MAX_PER_HOST)
+    return slot
+
+def load_manifest():
+    try:
+        with open(MANIFEST_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(manifest):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = MANIFEST_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_FILE)
+
+def filter_key(matcher, window):
+    """Fingerprint of the tvg-id filter and time window; cached shards are only valid for the filter that built them."""
+    digest = hashlib.sha1(f"v{SHARD_VERSION}:{window[0]}:{window[1]}".encode("utf-8"))
+    digest.update(matcher.fingerprint().encode("utf-8"))
+    return digest.hexdigest()
+
+def guide_window(now):
+    start = now - PAST_WINDOW_HOURS * 3600
+    stop = now + FUTURE_WINDOW_DAYS * 86400
+    return (int(start // WINDOW_GRANULARITY * WINDOW_GRANULARITY),
+            int(-(-stop // WINDOW_GRANULARITY) * WINDOW_GRANULARITY))
+
+def parse_xmltv_time(value):
+    """Convert an XMLTV 'YYYYMMDDhhmmss +zzzz' timestamp to epoch seconds without strptime.
+
+    Returns None for anything that doesn't look like a timestamp.
+    """
+    if not value:
+        return None
+    stamp, _, offset = value.partition(" ")
+    if len(stamp) > 14 and stamp[14] in "+-":
+        stamp, offset = stamp[:14], stamp[14:]
+    try:
+        day = _day_starts.get(stamp[:8])
+        if day is None:
+            day = _day_starts[stamp[:8]] = calendar.timegm((int(stamp[:4]), int(stamp[4:6]), int(stamp[6:8]), 0, 0, 0))
+        seconds = day + int(stamp[8:10] or 0) * 3600 + int(stamp[10:12] or 0) * 60 + int(stamp[12:14] or 0)
+        if offset:
+            shift = int(offset[1:3]) * 3600 + int(offset[3:5]) * 60
+            seconds += shift if offset[0] == "-" else -shift
+    except (ValueError, IndexError):
+        return None
+    return seconds
+
+def in_window(start, stop, window):
+    if start is not None and start >= window[1]:
+        return False
+    if stop is not None and stop <= window[0]:
+        return False
+    return True
+
+def shard_path(url):
+    return os.path.join(CACHE_DIR, hashlib.sha1(url.encode("utf-8")).hexdigest()[:16] + ".xml.gz")
+
+def schedule_path(shard):
+    """Sidecar holding (start, stop, title) per kept programme of a shard, for the now/next index."""
+    return shard[:-len(".xml.gz")] + ".schedule.json"
+
+def conditional_headers(entry):
+    headers = {}
+    if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+def is_unchanged(resp, entry):
+    """304, or a server that ignores validators but reports the same size and mtime."""
+    if resp.status_code == 304:
+        return True
+    length = resp.headers.get("Content-Length")
+    modified = resp.headers.get("Last-Modified")
+    return bool(length and modified) and length == entry.get("content_length") and modified == entry.get("last_modified")
+
+def fetch_with_retry(url, retries=3, delay=2, timeout=30, headers=None):
     for attempt in range(1, retries + 1):
+        r = None
         try:
-            r = requests.get(url, timeout=timeout)
+            r = SESSION.get(url, timeout=timeout, stream=True, headers=headers)
             r.raise_for_status()
             return r
+        except CircuitOpenError as e:
+            print(f"⛔ {e}, skipping {url}")
+            return None
         except Exception as e:
+            if r is not None:
+                r.close()
             print(f"⚠️ Attempt {attempt} failed for {url}: {e}")
             if attempt < retries:
-                time.sleep(delay)
+                time.sleep(delay * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
     return None
 
-def stream_parse_epg(file_obj, valid_tvg_ids, root):
+def open_gzip_member(fileobj):
+    """Text writer for one reproducible gzip member (no file name, zero mtime) on fileobj."""
+    return TextIOWrapper(gzip.GzipFile(filename="", mode="wb", fileobj=fileobj, mtime=0), encoding="utf-8")
+
+def maybe_gunzip(body):
+    if body.peek(2)[:2] == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=body, mode="rb")
+    return body
+
+def element_text(elem):
+    # The tail may not be parsed yet at this point; emit our own newline instead.
+    elem.tail = None
+    return ET.tostring(elem, encoding="unicode") + "\n"
+
+def write_element(out, elem):
+    out.write(element_text(elem))
+
+def stream_parse_epg(file_obj, matcher, out, skip_ids=frozenset(), window=None, schedule=None):
+    """Filter one XMLTV document into out, renaming matched ids to their playlist tvg-id.
+
+    Each tvg-id is supplied by a single source id: when a source lists both the exact id
+    and an alias of it, the exact id wins and the alias's channel and programmes are
+    dropped. <channel> elements are held back until the first programme so an exact id
+    listed after its alias can still take over.
+    """
     kept_channels = 0
     total_items = 0
+    pruned = 0
+    complete = False
+    kept_ids = set()
+    skipped_ids = set()
+    owners = {}
+    channel_ids = set()
+    pending = []
+
+    def emit_channel(tvg_id, text):
+        nonlocal kept_channels
+        if tvg_id not in channel_ids:
+            channel_ids.add(tvg_id)
+            out.write(text)
+            kept_ids.add(tvg_id)
+            kept_channels += 1
+
+    def flush_channels():
+        for tvg_id, source_id, text in pending:
+            if owners[tvg_id] == source_id:
+                emit_channel(tvg_id, text)
+
     try:
-        tree = ET.parse(file_obj)
-        for child in tree.getroot():
-            if child.tag == 'channel' or child.tag == 'programme':
-                total_items += 1
-                tvg_id = child.get('id') or child.get('channel')
-                if tvg_id in valid_tvg_ids:
-                    root.append(child)
-                    kept_channels += 1
-    except ET.ParseError:
-        print("❌ XML Parse Error")
-    return total_items, kept_channels
-
-def merge_and_filter_epg(epg_sources, playlist_url, output_file):
-    valid_tvg_ids = fetch_tvg_ids_from_playlist(playlist_url)
-    root = ET.Element("tv")
-    cumulative_kept = 0
-    cumulative_total = 0
+        context = ET.iterparse(file_obj, events=("start", "end"))
+        _, source_root = next(context)
+        for event, child in context:
+            if event != "end" or (child.tag != 'channel' and child.tag != 'programme'):
+                continue
+            total_items += 1
+            source_id = child.get('id') or child.get('channel')
+            tvg_id = matcher.resolve(source_id)
+            if tvg_id is not None:
+                if tvg_id != source_id:
+                    child.set('id' if child.tag == 'channel' else 'channel', tvg_id)
+                if tvg_id in skip_ids:
+                    skipped_ids.add(tvg_id)
+                elif child.tag == 'channel':
+                    if pending is not None:
+                        if tvg_id not in owners or source_id == tvg_id:
+                            owners[tvg_id] = source_id
+                        pending.append((tvg_id, source_id, element_text(child)))
+                    elif owners.setdefault(tvg_id, source_id) == source_id:
+                        emit_channel(tvg_id, element_text(child))
+                else:
+                    if pending is not None:
+                        flush_channels()
+                        pending = None
+                    if owners.setdefault(tvg_id, source_id) == source_id:
+                        start = parse_xmltv_time(child.get('start'))
+                        stop = parse_xmltv_time(child.get('stop'))
+                        if window is not None and not in_window(start, stop, window):
+                            pruned += 1
+                        else:
+                            if schedule is not None and start is not None:
+                                schedule.setdefault(tvg_id, []).append((start, stop, child.findtext('title') or ""))
+                            write_element(out, child)
+                            kept_ids.add(tvg_id)
+                            kept_channels += 1
+            child.clear()
+            # Drop the source root's reference so parsed siblings can be freed.
+            source_root.clear()
+        complete = True
+    except StopIteration:
+        print("❌ Empty XML document")
+    except ET.ParseError as e:
+        print(f"❌ XML Parse Error: {e}")
+    except Exception as e:
+        print(f"❌ Stream Error: {e}")
+    if pending is not None:
+        flush_channels()
+    return ParseStats(total_items, kept_channels, complete, kept_ids, skipped_ids, pruned)
+
+def init_parse_worker(matcher, window):
+    """Process-pool initializer: ship the filter to each worker once instead of per task."""
+    global _worker_filter
+    _worker_filter = (matcher, window)
+
+def parse_source_file(spool_path, shard_tmp_path, schedule_tmp_path, matcher, window, skip_ids):
+    """Filter a downloaded source into a shard plus its schedule sidecar."""
+    schedule = {}
+    with open(spool_path, "rb") as body, open(shard_tmp_path, "wb") as raw, open_gzip_member(raw) as shard:
+        stats = stream_parse_epg(maybe_gunzip(body), matcher, shard, skip_ids, window, schedule)
+    with open(schedule_tmp_path, "w", encoding="utf-8") as f:
+        json.dump(schedule, f, separators=(",", ":"))
+    return stats
 
-    for url in epg_sources:
-        print(f"\n🌐 Processing: {url}")
-        resp = fetch_with_retry(url, retries=3, delay=10, timeout=60)
+def parse_spool(spool_path, shard_tmp_path, schedule_tmp_path, skip_ids):
+    """Process-pool task: filter a downloaded source file into a shard."""
+    matcher, window = _worker_filter
+    return parse_source_file(spool_path, shard_tmp_path, schedule_tmp_path, matcher, window, skip_ids)
+
+def spool_response(resp, spool_path):
+    """Copy the response body to disk chunk by chunk, returning its SHA-256 (None if cut short)."""
+    digest = hashlib.sha256()
+    try:
+        with open(spool_path, "wb") as spool:
+            for chunk in resp.iter_content(CHUNK_SIZE):
+                digest.update(chunk)
+                spool.write(chunk)
+    except Exception as e:
+        # Leave the partial body for the parser, which will report it as incomplete.
+        print(f"❌ Stream Error: {e}")
+        return None
+    return digest.hexdigest()
+
+def cached_result(path, entry, saved_bytes):
+    return SourceResult(path, entry["total"], entry["kept"], entry, True, saved_bytes,
+                        set(entry["ids"]), set(entry["skipped"]))
+
+def process_source(index, url, guide_filter, entry, claims, parse_pool=None):
+    """Download and filter one source into its shard file; runs on a worker thread.
+
+    The body is spooled to disk and hashed while it downloads, which frees the
+    host slot early. If the hash matches the manifest the existing shard is
+    kept; otherwise the spool is parsed, in parse_pool when one is given.
+    """
+    path = shard_path(url)
+    cached = entry is not None and entry.get("filter_key") == guide_filter.key and os.path.exists(path)
+    headers = conditional_headers(entry) if cached else None
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    schedule_tmp_path = f"{schedule_path(path)}.{threading.get_ident()}.tmp"
+    spool_path = f"{path}.{threading.get_ident()}.src"
+    with host_slot(url):
+        print(f"🌐 Processing: {url}")
+        resp = fetch_with_retry(url, retries=3, delay=5, timeout=60, headers=headers)
         if not resp:
-            print(f"❌ Failed to fetch {url}")
+            if cached:
+                print(f"⚠️ Failed to fetch {url}, merging last cached copy")
+                result = cached_result(path, entry, 0)
+            else:
+                print(f"❌ Failed to fetch {url}")
+                result = SourceResult(None, 0, 0, None, False, 0, set(), set())
+            claims.publish(index, result.ids)
+            return result
+        with resp:
+            if cached and is_unchanged(resp, entry):
+                print(f"♻️ {url} unchanged, merged from cache")
+                result = cached_result(path, entry, entry["bytes"])
+                claims.publish(index, result.ids)
+                return result
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            content_hash = spool_response(resp, spool_path)
+            received = resp.raw.tell()
+    validators = {
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "content_length": resp.headers.get("Content-Length"),
+        "bytes": received,
+    }
+
+    try:
+        if cached and content_hash and content_hash == entry.get("sha256"):
+            print(f"♻️ {url} content hash unchanged, reusing shard")
+            result = cached_result(path, dict(entry, **validators), 0)
+            claims.publish(index, result.ids)
+            return result
+        # Ids already supplied by a finished higher-priority source will be dropped at
+        # assembly anyway, so don't spend time serialising them here.
+        skip_ids = claims.claimed_before(index)
+        if parse_pool is None:
+            stats = parse_source_file(spool_path, tmp_path, schedule_tmp_path,
+                                      guide_filter.matcher, guide_filter.window, skip_ids)
+        else:
+            stats = parse_pool.submit(parse_spool, spool_path, tmp_path, schedule_tmp_path, skip_ids).result()
+    finally:
+        os.remove(spool_path)
+    if cached and not (stats.complete and content_hash):
+        # A cut-short download must not replace the last good shard.
+        for partial in (tmp_path, schedule_tmp_path):
+            if os.path.exists(partial):
+                os.remove(partial)
+        print(f"⚠️ Incomplete download of {url}, merging last cached copy")
+        result = cached_result(path, entry, 0)
+        claims.publish(index, result.ids)
+        return result
+    os.replace(tmp_path, path)
+    os.replace(schedule_tmp_path, schedule_path(path))
+    claims.publish(index, stats.ids)
+    print(f"📊 {url} — Total items found: {stats.total}, Kept: {stats.kept}, "
+          f"Pruned outside window: {stats.pruned}, "
+          f"Skipped channels claimed by earlier sources: {len(stats.skipped)}")
+
+    new_entry = None
+    if stats.complete and content_hash:
+        new_entry = dict(validators,
+                         sha256=content_hash,
+                         filter_key=guide_filter.key,
+                         total=stats.total,
+                         kept=stats.kept,
+                         ids=sorted(stats.ids),
+                         skipped=sorted(stats.skipped))
+    return SourceResult(path, stats.total, stats.kept, new_entry, False, 0, stats.ids, stats.skipped)
+
+def copy_shard(path, out, drop_ids):
+    """Append a shard to the guide as its own gzip member.
+
+    Shards with nothing to drop are copied byte for byte without being
+    decompressed; otherwise the elements whose channel belongs to an earlier
+    source are filtered out and the rest re-encoded.
+    """
+    dropped = 0
+    if not drop_ids:
+        with open(path, "rb") as shard:
+            shutil.copyfileobj(shard, out, CHUNK_SIZE)
+        return dropped
+    with gzip.open(path, "rt", encoding="utf-8") as shard, open_gzip_member(out) as member:
+        # Shards are bare element sequences, so wrap them in a root for the parser.
+        parser = ET.XMLPullParser(events=("start", "end"))
+        parser.feed("<tv>")
+        wrapper = None
+        chunk = shard.read(CHUNK_SIZE)
+        while True:
+            if not chunk:
+                parser.feed("</tv>")
+            else:
+                parser.feed(chunk)
+            for event, elem in parser.read_events():
+                if wrapper is None:
+                    wrapper = elem
+                    continue
+                if event != "end" or (elem.tag != 'channel' and elem.tag != 'programme'):
+                    continue
+                if (elem.get('id') or elem.get('channel')) in drop_ids:
+                    dropped += 1
+                else:
+                    write_element(member, elem)
+                wrapper.clear()
+            if not chunk:
+                break
+            chunk = shard.read(CHUNK_SIZE)
+        parser.close()
+    return dropped
+
+def claim_channels(results):
+    """Give each channel id to the first source that supplies it.
+
+    Returns, per result, the ids it must drop because an earlier source
+    already claimed them.
+    """
+    claimed = set()
+    drops = []
+    for result in results:
+        drops.append(result.ids & claimed)
+        claimed |= result.ids
+    return drops
+
+def write_guide(output_file, results, drops):
+    """Concatenate the shards into the guide in source order, then swap it in atomically.
+
+    The guide is a multi-member gzip file: a header member, one member per
+    shard and a footer member.
+    """
+    dropped = 0
+    tmp_path = output_file + ".tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(gzip.compress(XML_HEADER.encode("utf-8"), mtime=0))
+        for result, drop_ids in zip(results, drops):
+            dropped += copy_shard(result.shard, out, drop_ids)
+        out.write(gzip.compress(XML_FOOTER.encode("utf-8"), mtime=0))
+    os.replace(tmp_path, output_file)
+    return dropped
+
+def write_now_next_index(index_file, results, drops, base):
+    """Write a compact per-channel schedule so "what's on now" is a binary search.
+
+    Layout: {"base": epoch, "channels": {tvg_id: {"start": [...], "stop": [...],
+    "title": [...]}}}, with start/stop as seconds after base and each channel
+    sorted by start. Built from the schedule sidecars, so no shard is re-parsed.
+    """
+    schedules = {}
+    for result, drop_ids in zip(results, drops):
+        try:
+            with open(schedule_path(result.shard), "r", encoding="utf-8") as f:
+                schedule = json.load(f)
+        except (OSError, ValueError):
             continue
-        content = resp.content
-        if url.endswith(".gz"):
-            content = gzip.decompress(content)
-        total, kept = stream_parse_epg(BytesIO(content), valid_tvg_ids, root)
-        cumulative_total += total
-        cumulative_kept += kept
-        print(f"📊 Total items found: {total}, Kept: {kept}")
+        for tvg_id, programmes in schedule.items():
+            if tvg_id not in drop_ids:
+                schedules.setdefault(tvg_id, []).extend(programmes)
+
+    channels = {}
+    for tvg_id in sorted(schedules):
+        programmes = sorted(schedules[tvg_id], key=lambda p: (p[0], p[2]))
+        starts = [start - base for start, _, _ in programmes]
+        # A missing stop runs until the next programme starts.
+        stops = [(stop if stop is not None else (programmes[i + 1][0] if i + 1 < len(programmes) else start)) - base
+                 for i, (start, stop, _) in enumerate(programmes)]
+        channels[tvg_id] = {"start": starts, "stop": stops, "title": [title for _, _, title in programmes]}
+
+    tmp_path = index_file + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"base": base, "channels": channels}, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, index_file)
+    return sum(len(channel["start"]) for channel in channels.values())
 
-    with gzip.open(output_file, "wt", encoding="utf-8") as f:
-        ET.ElementTree(root).write(f, encoding="unicode", xml_declaration=True)
+def merge_and_filter_epg(epg_sources, playlist_url, output_file, index_file=None):
+    unique_sources = list(dict.fromkeys(epg_sources))
+    if len(unique_sources) != len(epg_sources):
+        print(f"🧹 Ignoring {len(epg_sources) - len(unique_sources)} duplicate EPG source URL(s)")
+    if TVG_ID_SOURCE == "local":
+        valid_tvg_ids = load_local_tvg_ids()
+    else:
+        valid_tvg_ids = fetch_tvg_ids_from_playlist(playlist_url)
+    if not valid_tvg_ids:
+        print(f"❌ No tvg-ids to filter on, keeping the existing {output_file}")
+        return
+    matcher = TvgIdMatcher(valid_tvg_ids, TVG_ID_ALIASES, LOOSE_TVG_ID_MATCHING)
+    window = guide_window(time.time())
+    guide_filter = GuideFilter(matcher, window, filter_key(matcher, window))
+    manifest = load_manifest()
+    next_manifest = {}
+    claims = SourceClaims()
+    results = []
+    cumulative_kept = 0
+    cumulative_total = 0
+    cache_hits = 0
+    bytes_saved = 0
+    started = time.time()
+
+    parse_pool = None
+    if PARSE_PROCESSES > 1:
+        parse_pool = ProcessPoolExecutor(max_workers=PARSE_PROCESSES,
+                                         mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=init_parse_worker,
+                                         initargs=(guide_filter.matcher, guide_filter.window))
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [executor.submit(process_source, index, url, guide_filter, manifest.get(url), claims, parse_pool)
+                   for index, url in enumerate(unique_sources)]
+        # Collect in submission order so the output keeps the epg_sources order.
+        for index, (url, future) in enumerate(zip(unique_sources, futures)):
+            result = future.result()
+            if result.cache_hit and result.skipped - claims.claimed_before(index):
+                # The cached shard left out channels that no earlier source supplies any more.
+                print(f"🔄 {url} cached shard is missing channels no longer claimed elsewhere, reprocessing")
+                result = process_source(index, url, guide_filter, None, claims, parse_pool)
+            if result.shard:
+                results.append(result)
+            cumulative_total += result.total
+            cumulative_kept += result.kept
+            if result.entry:
+                next_manifest[url] = result.entry
+            if result.cache_hit:
+                cache_hits += 1
+                bytes_saved += result.saved_bytes
+
+    if parse_pool is not None:
+        parse_pool.shutdown()
+
+    print(f"\n⏱️ Fetched and parsed {len(unique_sources)} sources in {time.time() - started:.1f}s")
+
+    drops = claim_channels(results)
+    dropped = write_guide(output_file, results, drops)
+    cumulative_kept -= dropped
+    if index_file:
+        indexed = write_now_next_index(index_file, results, drops, window[0])
+        print(f"🗂️ Now/next index with {indexed} programmes saved to: {index_file}")
+
+    for url in (manifest.keys() | set(unique_sources)) - next_manifest.keys():
+        for path in (shard_path(url), schedule_path(shard_path(url))):
+            if os.path.exists(path):
+                os.remove(path)
+    save_manifest(next_manifest)
 
     print(f"\n✅ Filtered EPG saved to: {output_file}")
     print(f"📈 Cumulative items processed: {cumulative_total}")
     print(f"📈 Total items kept: {cumulative_kept}")
+    print(f"🧹 Duplicate items dropped at merge: {dropped}")
+    print(f"♻️ Cache hits: {cache_hits}/{len(unique_sources)}, bytes saved: {bytes_saved / 1048576:.1f} MiB")
+    if HOSTS.summary():
+        print(HOSTS.summary())
+
+def benchmark_window_filter(count=200000):
+    """Compare strptime against parse_xmltv_time when checking programmes against the window."""
+    from datetime import datetime
+    base = calendar.timegm((2025, 1, 1, 0, 0, 0))
+    stamps = [time.strftime("%Y%m%d%H%M%S", time.gmtime(base + i * 1800)) + " +0100" for i in range(count)]
+    window = guide_window(base + count * 900)
+
+    def strptime_check():
+        kept = 0
+        for value in stamps:
+            start = datetime.strptime(value, "%Y%m%d%H%M%S %z").timestamp()
+            kept += window[0] < start < window[1]
+        return kept
+
+    def fast_check():
+        kept = 0
+        for value in stamps:
+            start = parse_xmltv_time(value)
+            kept += window[0] < start < window[1]
+        return kept
+
+    for label, check in (("strptime", strptime_check), ("parse_xmltv_time", fast_check)):
+        started = time.perf_counter()
+        kept = check()
+        elapsed = time.perf_counter() - started
+        print(f"⏱️ {label:>16}: {count / elapsed:,.0f} programmes/s ({kept} in window)")
 
 if __name__ == "__main__":
-    merge_and_filter_epg(epg_sources, playlist_url, output_filename)
+    if "--bench" in sys.argv[1:]:
+        benchmark_window_filter()
+    else:
+        merge_and_filter_epg(epg_sources, playlist_url, output_filename, now_next_filename)
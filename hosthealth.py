@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+# Each host's timeout is learned from its recent latencies: TIMEOUT_MULTIPLIER x the
+# LATENCY_PERCENTILE latency plus TIMEOUT_SLACK, kept between MIN_TIMEOUT and the caller's
+# own timeout. Until MIN_SAMPLES responses have been seen the caller's timeout applies.
+DEFAULT_TIMEOUT = 30
+MIN_TIMEOUT = 5
+MIN_SAMPLES = 5
+SAMPLE_WINDOW = 50
+LATENCY_PERCENTILE = 0.95
+TIMEOUT_MULTIPLIER = 4
+TIMEOUT_SLACK = 1.0
+
+# After FAILURE_THRESHOLD consecutive failures a host's breaker opens and requests to it
+# are skipped; once BREAKER_COOLDOWN seconds have passed a single trial request is let
+# through, which closes the breaker again if it succeeds.
+FAILURE_THRESHOLD = 3
+BREAKER_COOLDOWN = 300
+
+def host_of(url):
+    return urlsplit(url).netloc.lower()
+
+class HostState:
+    __slots__ = ("latencies", "failures", "opened_at", "trial", "skipped")
+
+    def __init__(self):
+        self.latencies = deque(maxlen=SAMPLE_WINDOW)
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.skipped = 0
+
+class HostHealth:
+    """Per-host latency history and circuit breakers shared by every client in a run.
+
+    Thread-safe, so the requests thread pools and the asyncio checkers can share one
+    instance (HOSTS).
+    """
+
+    def __init__(self, min_timeout=MIN_TIMEOUT, failure_threshold=FAILURE_THRESHOLD,
+                 cooldown=BREAKER_COOLDOWN):
+        self.min_timeout = min_timeout
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _state(self, url):
+        host = host_of(url)
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostState()
+        return state
+
+    def timeout(self, url, ceiling=DEFAULT_TIMEOUT, round_trips=1):
+        """Seconds to allow a request to url that needs round_trips responses from the host."""
+        ceiling = ceiling or DEFAULT_TIMEOUT
+        with self._lock:
+            latencies = sorted(self._state(url).latencies)
+        if len(latencies) < MIN_SAMPLES:
+            return ceiling
+        percentile = latencies[min(len(latencies) - 1, int(LATENCY_PERCENTILE * len(latencies)))]
+        learned = (percentile * TIMEOUT_MULTIPLIER + TIMEOUT_SLACK) * round_trips
+        return min(ceiling, max(self.min_timeout, learned))
+
+    def allow(self, url):
+        """False while the host's breaker is open; counts the skipped request."""
+        with self._lock:
+            state = self._state(url)
+            if state.opened_at is None:
+                return True
+            if not state.trial and time.monotonic() - state.opened_at >= self.cooldown:
+                state.trial = True
+                return True
+            state.skipped += 1
+            return False
+
+    def success(self, url, latency):
+        with self._lock:
+            state = self._state(url)
+            state.latencies.append(latency)
+            state.failures = 0
+            state.opened_at = None
+            state.trial = False
+
+    def failure(self, url):
+        with self._lock:
+            state = self._state(url)
+            state.failures += 1
+            if state.trial or state.failures >= self.failure_threshold:
+                if state.opened_at is None or state.trial:
+                    print(f"⛔ Circuit open for {host_of(url)} after {state.failures} failures")
+                state.opened_at = time.monotonic()
+                state.trial = False
+
+    def open_hosts(self):
+        with self._lock:
+            return {host: state.skipped for host, state in self._hosts.items() if state.opened_at is not None}
+
+    def summary(self):
+        """One line naming the hosts skipped this run, or '' when every breaker stayed closed."""
+        hosts = self.open_hosts()
+        if not hosts:
+            return ""
+        listed = ", ".join(f"{host} ({skipped} skipped)" for host, skipped in sorted(hosts.items()))
+        return f"⛔ Open circuits: {listed}"
+
+HOSTS = HostHealth()
@@ -0,0 +1,41 @@
+import requests
+from requests.adapters import HTTPAdapter
+from hosthealth import HOSTS, host_of
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of contacting a host whose circuit breaker is open."""
+
+class HealthAdapter(HTTPAdapter):
+    """HTTPAdapter that sizes every request's timeout from its host's latency history and
+    refuses hosts whose breaker is open.
+
+    The timeout the caller passes is the ceiling; none at all means DEFAULT_TIMEOUT, so no
+    request can hang a job. Connection errors, timeouts and 5xx responses count as failures.
+    """
+
+    def __init__(self, health=HOSTS, **kwargs):
+        self.health = health
+        super().__init__(**kwargs)
+
+    def send(self, request, stream=False, timeout=None, **kwargs):
+        if not self.health.allow(request.url):
+            raise CircuitOpenError(f"Circuit open for {host_of(request.url)}", request=request)
+        ceiling = max(timeout) if isinstance(timeout, tuple) else timeout
+        try:
+            resp = super().send(request, stream=stream, timeout=self.health.timeout(request.url, ceiling), **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            self.health.failure(request.url)
+            raise
+        if resp.status_code >= 500:
+            self.health.failure(request.url)
+        else:
+            self.health.success(request.url, resp.elapsed.total_seconds())
+        return resp
+
+def new_session(pool_size=10, health=HOSTS):
+    """requests.Session whose every request goes through a HealthAdapter."""
+    session = requests.Session()
+    adapter = HealthAdapter(health, pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
@@ -1,5 +1,6 @@
-import requests
 import re
+from httpsession import new_session
+from m3u import parse_m3u
 
 UPSTREAM_URL = "https://gitea.com/luongz/utako/raw/branch/main/jp.m3u"
 OUTPUT_FILE = "JapanTV.m3u8"
@@ -8,48 +9,36 @@ TVG_HEADER = '#EXTM3U url-tvg="https://epg.freejptv.com/jp.xml,https://animenose
 
 group_regex = re.compile(r'group-title=".*?"')
 
+SESSION = new_session()
+
 def get_existing_urls(file_path):
     urls = set()
     try:
         with open(file_path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-        for i, line in enumerate(lines):
-            if line.startswith("#EXTINF") and i + 1 < len(lines):
-                urls.add(lines[i + 1].strip())
+            urls.update(channel.url for channel in parse_m3u(f, file_path))
         return urls
     except FileNotFoundError:
         return set()
 
 def clean_and_force_group(m3u_content, existing_urls):
-    lines = m3u_content.strip().splitlines()
     output_lines = []
-    skip_next = False
 
-    for i, line in enumerate(lines):
-        if skip_next:
-            skip_next = False
+    for channel in parse_m3u(m3u_content.splitlines(), UPSTREAM_URL):
+        if channel.group == "Information" or channel.url in existing_urls:
             continue
 
-        if line.startswith("#EXTINF"):
-            if 'group-title="Information"' in line:
-                skip_next = True
-                continue
-
-            if i + 1 < len(lines):
-                url_line = lines[i + 1].strip()
-                if url_line not in existing_urls:
-                    if 'group-title="' in line:
-                        line = group_regex.sub(f'group-title="{FORCED_GROUP_NAME}"', line)
-                    else:
-                        line = line.replace('#EXTINF:', f'#EXTINF group-title="{FORCED_GROUP_NAME}":')
+        line = channel.extinf
+        if 'group-title="' in line:
+            line = group_regex.sub(f'group-title="{FORCED_GROUP_NAME}"', line)
+        else:
+            line = line.replace('#EXTINF:', f'#EXTINF group-title="{FORCED_GROUP_NAME}":')
 
-                    output_lines.append(line)
-                    output_lines.append(url_line)
-                skip_next = True
+        output_lines.append(line)
+        output_lines.append(channel.url)
     return output_lines
 
 def main():
-    response = requests.get(UPSTREAM_URL)
+    response = SESSION.get(UPSTREAM_URL)
     if response.status_code != 200:
         print(f"❌ Failed to download: HTTP {response.status_code}")
         return
@@ -0,0 +1,335 @@
+import hashlib
+import os
+import re
+import time
+from array import array
+from functools import lru_cache
+from urllib.parse import urlencode, urlsplit, parse_qsl
+
+EXTINF_PREFIX = "#EXTINF:"
+VLC_OPTION_PREFIX = "#EXTVLCOPT:"
+
+attr_regex = re.compile(r'([\w-]+)="([^"]*)"')
+
+# Query parameters that change per request/session (tokens, expiry, session and device
+# ids, signatures) and say nothing about which stream a URL points at.
+VOLATILE_PARAMS = frozenset({
+    "token", "expires", "exp", "user_id", "userid", "uid", "sid", "sessionid", "session",
+    "nonce", "palnonce", "givn", "cachebust", "clienttime", "ts", "time", "signature", "sig",
+    "policy", "key-pair-id", "hash", "auth", "hdnts", "hdntl", "ticket", "playbackid",
+    "deviceid", "device_id", "did", "advertisingid", "ifa", "rdid", "ip", "ip_addr",
+})
+# Ad-insertion namespaces: 'ads.did' is as volatile as 'did', but the rest of the family
+# is not. Parameters such as ads.xumo_channelId or ads.csid are all that tells apart
+# channels served from one shared path, so they stay in the identity.
+AD_PARAM_NAMESPACES = ("ads._fw_", "ads.", "ad.", "imafw_", "reqargs.")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+# (url, url, same stream?) pairs canonical_url must keep apart or fold together.
+XUMO_URL = "https://d1bl6tskrpq9ze.cloudfront.net/hls/master.m3u8?ads.xumo_channelId={}&ads.csid={}&ads.did=[IFA]&ads.givn={}"
+CANONICAL_URL_CASES = [
+    (XUMO_URL.format("99992256", "lgchannels_us_forensicfilesca_ssai", "a1"),
+     XUMO_URL.format("99992249", "lgchannels_us_filmriseunsolvedmysteriesca_ssai", "a1"), False),
+    (XUMO_URL.format("99992256", "lgchannels_us_forensicfilesca_ssai", "a1"),
+     XUMO_URL.format("99992256", "lgchannels_us_forensicfilesca_ssai", "b2"), True),
+    ("https://v8.thetvapp.to/hls/HallmarkDrama/tracks-v1a1/mono.m3u8?token=U2Brk&expires=1762033269&user_id=clY3",
+     "https://v8.thetvapp.to/hls/HallmarkDrama/tracks-v1a1/mono.m3u8?token=k3Q5g&expires=1762033279&user_id=clY3", True),
+    ("https://example.com/live/master.m3u8?channel=1&ads._fw_did=x", "https://example.com/live/master.m3u8?channel=2&ads._fw_did=x", False),
+]
+
+BENCH_FILES = ["LocalNowTV.m3u8", "LGTV.m3u8", "DrewLiveVOD.m3u8"]
+BENCH_ROUNDS = 20
+
+def extinf_title(extinf):
+    """Display title: whatever follows the last comma of the #EXTINF line."""
+    _, comma, title = extinf.rpartition(",")
+    return title.strip() if comma else ""
+
+class Channel:
+    """One playlist entry with its #EXTINF attributes parsed once up front."""
+    __slots__ = ("extinf", "headers", "url", "tvg_id", "tvg_name", "logo", "group", "title", "options")
+
+    def __init__(self, extinf, headers, url):
+        self.extinf = extinf
+        self.headers = headers
+        self.url = url
+        attrs = {}
+        for key, value in attr_regex.findall(extinf):
+            attrs.setdefault(key, value)
+        self.tvg_id = attrs.get("tvg-id", "")
+        self.tvg_name = attrs.get("tvg-name", "")
+        self.logo = attrs.get("tvg-logo", "")
+        self.group = attrs.get("group-title", "")
+        self.title = extinf_title(extinf)
+        self.options = tuple(h for h in headers if h.startswith(VLC_OPTION_PREFIX))
+
+    def __repr__(self):
+        return f"Channel({self.title!r}, group={self.group!r}, url={self.url!r})"
+
+def parse_m3u(lines, source="Unknown"):
+    """Yield a Channel for every #EXTINF entry in lines (any iterable of str, e.g. an open file).
+
+    '#' lines between an #EXTINF and its URL are kept as headers; entries whose URL is
+    missing or a '*' placeholder are reported and dropped.
+    """
+    extinf = None
+    headers = []
+    for raw in lines:
+        line = raw.strip()
+        if not line:
+            continue
+        if line.startswith(EXTINF_PREFIX):
+            if extinf is not None:
+                print(f"⚠️ Skipped entry in {source}. Reason: No URL before next #EXTINF. Channel Info: {extinf}")
+            extinf = line
+            headers = []
+        elif extinf is None:
+            continue
+        elif line.startswith("#"):
+            headers.append(line)
+        elif line == "*":
+            print(f"⚠️ Skipped entry in {source}. Reason: Invalid or placeholder URL '{line}'. Channel Info: {extinf}")
+            extinf = None
+        else:
+            yield Channel(extinf, tuple(headers), line)
+            extinf = None
+    if extinf is not None:
+        print(f"⚠️ Skipped entry in {source}. Reason: No URL at end of playlist. Channel Info: {extinf}")
+
+def is_volatile_param(key):
+    name = key.lower()
+    for namespace in AD_PARAM_NAMESPACES:
+        if name.startswith(namespace):
+            name = name[len(namespace):]
+            break
+    return name in VOLATILE_PARAMS
+
+@lru_cache(maxsize=None)
+def canonical_url(url):
+    """host[:port]/path?stable-params for a stream URL.
+
+    Scheme, default ports, fragments and volatile query parameters are dropped, the
+    remaining parameters are sorted, and proxied URLs passed as parameter values are
+    canonicalised the same way.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS.get(parts.scheme.lower()):
+        host = f"{host}:{port}"
+    params = []
+    for key, value in parse_qsl(parts.query, keep_blank_values=True):
+        if is_volatile_param(key):
+            continue
+        if value.startswith(("http://", "https://")):
+            value = canonical_url(value)
+        params.append((key, value))
+    params.sort()
+    return f"{host}{parts.path}?{urlencode(params)}" if params else f"{host}{parts.path}"
+
+def stream_identity(url, tvg_id):
+    """Dedup key: the same stream under the same guide id, whatever group or token it carries."""
+    return canonical_url(url), tvg_id.lower()
+
+class StringPool:
+    """Dictionary encoding: each distinct value is stored once and referred to by index."""
+    __slots__ = ("values", "_ids")
+
+    def __init__(self):
+        self.values = []
+        self._ids = {}
+
+    def add(self, value):
+        index = self._ids.get(value)
+        if index is None:
+            index = self._ids[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def __len__(self):
+        return len(self.values)
+
+    def ranks(self, key=None):
+        """Each value's position in sorted order; values with equal keys share a rank."""
+        key = key or (lambda value: value)
+        ranks = array("I", bytes(4 * len(self.values)))
+        previous = rank = None
+        for index in sorted(range(len(self.values)), key=lambda i: key(self.values[i])):
+            current = key(self.values[index])
+            if rank is None or current != previous:
+                rank = 0 if rank is None else rank + 1
+                previous = current
+            ranks[index] = rank
+        return ranks
+
+class ChannelTable:
+    """Column store for many parsed entries.
+
+    Only the EXTINF line and URL are kept per row as strings. Group, tvg-id and the
+    header-line set are dictionary-encoded into int columns, so thousands of entries
+    sharing a group or #EXTVLCOPT block share one copy. Per-entry attributes the merge
+    never reads on their own (logo, title) stay inside the EXTINF line.
+    """
+
+    def __init__(self):
+        self.extinf = []
+        self.url = []
+        self.groups = StringPool()
+        self.tvg_ids = StringPool()
+        self.header_sets = StringPool()
+        self.group = array("I")
+        self.tvg_id = array("I")
+        self.headers = array("I")
+
+    def __len__(self):
+        return len(self.url)
+
+    def append(self, channel):
+        self.extinf.append(channel.extinf)
+        self.url.append(channel.url)
+        self.group.append(self.groups.add(channel.group))
+        self.tvg_id.append(self.tvg_ids.add(channel.tvg_id))
+        self.headers.append(self.header_sets.add(channel.headers))
+
+    def extend(self, channels):
+        """Append channels; returns the range of rows they occupy."""
+        start = len(self)
+        for channel in channels:
+            self.append(channel)
+        return range(start, len(self))
+
+    def group_name(self, row):
+        return self.groups[self.group[row]] or "Other"
+
+    def header_lines(self, row):
+        return self.header_sets[self.headers[row]]
+
+    def identity(self, row):
+        """stream_identity() of a row."""
+        return stream_identity(self.url[row], self.tvg_ids[self.tvg_id[row]])
+
+    def sort_key(self):
+        """Key function ordering rows by lowercased group and title, then EXTINF, headers
+        and URL. Group and title compare as one precomputed integer per row; the strings
+        only break ties. Build it after the last append."""
+        titles = StringPool()
+        title = array("I", (titles.add(extinf_title(line).lower()) for line in self.extinf))
+        title_rank = titles.ranks()
+        group_rank = self.groups.ranks(lambda group: (group or "Other").lower())
+        title_count = len(titles)
+        primary = array("Q", (group_rank[g] * title_count + title_rank[t] for g, t in zip(self.group, title)))
+        del titles, title, title_rank
+        header_rank = self.header_sets.ranks()
+        headers, extinf, url = self.headers, self.extinf, self.url
+
+        def key(row):
+            return primary[row], extinf[row], header_rank[headers[row]], url[row]
+
+        return key
+
+def file_sha256(path):
+    """Hex digest of an existing file, or None if it does not exist."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+class PlaylistWriter:
+    """Streams playlist text to a temp file next to path while hashing it.
+
+    On close the temp file atomically replaces path, or is discarded when the content
+    is byte-identical to what is already there. Use as a context manager; an exception
+    inside the block leaves the existing file untouched.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.sha256 = None
+        self.changed = None
+        self.line_count = 0
+        self._digest = hashlib.sha256()
+        self._size = 0
+        self._file = open(self.tmp_path, "wb")
+
+    def write(self, text):
+        data = text.encode("utf-8")
+        self._digest.update(data)
+        self._size += len(data)
+        self._file.write(data)
+        self.line_count += text.count("\n")
+
+    def write_line(self, line=""):
+        self.write(line + "\n")
+
+    def close(self):
+        """Publish the temp file if the content changed; returns whether it did."""
+        self._file.close()
+        self.sha256 = self._digest.hexdigest()
+        unchanged = (
+            os.path.isfile(self.path)
+            and os.path.getsize(self.path) == self._size
+            and file_sha256(self.path) == self.sha256
+        )
+        if unchanged:
+            os.remove(self.tmp_path)
+        else:
+            os.replace(self.tmp_path, self.path)
+        self.changed = not unchanged
+        return self.changed
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+def check_canonical_url(cases=CANONICAL_URL_CASES):
+    """Report whether canonical_url folds together exactly the pairs marked as one stream."""
+    failures = 0
+    for first, second, same in cases:
+        if (canonical_url(first) == canonical_url(second)) != same:
+            failures += 1
+            print(f"❌ canonical_url {'split' if same else 'merged'}:\n   {first}\n   {second}")
+    print(f"✅ canonical_url: {len(cases)} cases passed" if not failures
+          else f"❌ canonical_url: {failures}/{len(cases)} cases failed")
+    return not failures
+
+def benchmark_parser(files=BENCH_FILES, rounds=BENCH_ROUNDS):
+    """Entries per second for parse_m3u on the repo's largest playlists."""
+    for path in files:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        start = time.perf_counter()
+        for _ in range(rounds):
+            count = sum(1 for _ in parse_m3u(lines, path))
+        elapsed = time.perf_counter() - start
+        print(f"⏱️ {path}: {count} entries x {rounds} rounds in {elapsed:.3f}s "
+              f"({count * rounds / elapsed:,.0f} entries/s)")
+
+if __name__ == "__main__":
+    check_canonical_url()
+    benchmark_parser()
@@ -1,8 +1,9 @@
 import requests
 import json
 import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import sys
+from httpsession import new_session
+from m3u import PlaylistWriter
+from streamcheck import LivenessCache, check_urls, summarize
 
 json_urls = [
     "https://magnetic.website/MAD_TITAN_SPORTS/TOOLS/METAL/luc-247.json",
@@ -14,22 +15,12 @@ STATIC_LOGO_URL = "https://www.wirelesshack.org/wp-content/uploads/2022/01/How-T
 MAX_WORKERS = 50
 CHECK_TIMEOUT = 5
 
-def check_stream(channel_info, session):
-    url = channel_info.get("stream_url")
-    if not url:
-        return None
-    try:
-        response = session.head(url, timeout=CHECK_TIMEOUT, allow_redirects=True)
-        if response.status_code == 200:
-            return channel_info
-    except requests.exceptions.RequestException:
-        pass
-    return None
+SESSION = new_session()
 
 all_channels = []
 for url in json_urls:
     try:
-        response = requests.get(url, timeout=20)
+        response = SESSION.get(url, timeout=20)
         response.raise_for_status()
         data = response.json()
         
@@ -55,21 +46,12 @@ for url in json_urls:
     except json.JSONDecodeError:
         print(f"Error: Could not decode JSON from {url}.")
 
-valid_channels = []
-total_to_check = len(all_channels)
-
-with requests.Session() as session:
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        future_to_channel = {executor.submit(check_stream, channel, session): channel for channel in all_channels}
-        
-        for i, future in enumerate(as_completed(future_to_channel)):
-            result = future.result()
-            if result:
-                valid_channels.append(result)
-            
-            progress = (i + 1) / total_to_check * 100
-            sys.stdout.write(f"\rChecking streams... {int(progress)}% complete")
-            sys.stdout.flush()
+print(f"Checking {len(all_channels)} streams...")
+cache = LivenessCache()
+results = check_urls([channel["stream_url"] for channel in all_channels], timeout=CHECK_TIMEOUT, max_in_flight=MAX_WORKERS, cache=cache)
+cache.close()
+valid_channels = [channel for channel, result in zip(all_channels, results) if result.ok]
+print(f"Stream check: {summarize(results)}; {cache.summary()}")
 
 m3u8_content = "#EXTM3U\n"
 for channel in valid_channels:
@@ -77,8 +59,11 @@ for channel in valid_channels:
     m3u8_content += f'{channel["stream_url"]}\n'
 
 try:
-    with open("MadTitan.m3u8", "w", encoding="utf-8") as file:
+    with PlaylistWriter("MadTitan.m3u8") as file:
         file.write(m3u8_content)
-    print(f"\n\nSuccess! Wrote {len(valid_channels)} valid streams to 'MadTitan.m3u8'.")
+    if file.changed:
+        print(f"\n\nSuccess! Wrote {len(valid_channels)} valid streams to 'MadTitan.m3u8'.")
+    else:
+        print(f"\n\n'MadTitan.m3u8' unchanged ({len(valid_channels)} valid streams).")
 except Exception as e:
     print(f"\nError writing to file: {e}")
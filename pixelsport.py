@@ -1,6 +1,6 @@
-import json
-import urllib.request
-from urllib.error import URLError, HTTPError
+from httpsession import new_session
+from m3u import PlaylistWriter
+from streamcheck import RANK_SEGMENT_PEEK, check_urls, rank_mirrors, summarize
 
 BASE = "https://pixelsport.tv"
 API_EVENTS = f"{BASE}/backend/liveTV/events"
@@ -13,6 +13,10 @@ LIVE_TV_ID = "24.7.Dummy.us"
 VLC_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
 VLC_REFERER = f"{BASE}/"
 VLC_ICY = "1"
+# What players send per the #EXTVLCOPT lines; mirrors are timed with the same headers.
+PLAYER_HEADERS = {"User-Agent": VLC_USER_AGENT, "Referer": VLC_REFERER, "Icy-MetaData": VLC_ICY}
+
+SESSION = new_session()
 
 LEAGUE_INFO = {
     "NFL": ("NFL.Dummy.us", "http://drewlive24.duckdns.org:9000/Logos/Maxx.png", "NFL"),
@@ -35,9 +39,9 @@ def fetch_json(url):
         "Connection": "close",
         "Icy-MetaData": VLC_ICY,
     }
-    req = urllib.request.Request(url, headers=headers)
-    with urllib.request.urlopen(req, timeout=10) as resp:
-        return json.loads(resp.read().decode("utf-8"))
+    resp = SESSION.get(url, headers=headers, timeout=10)
+    resp.raise_for_status()
+    return resp.json()
 
 
 def collect_links(obj, prefix=""):
@@ -53,6 +57,14 @@ def collect_links(obj, prefix=""):
     return links
 
 
+def rank_links(links, checks):
+    """Order a channel's mirrors fastest first; unchecked or dead ones keep their place at the end."""
+    if not checks:
+        return links
+    ranked = rank_mirrors([checks[link] for link in links])
+    return [result.url for result in ranked]
+
+
 def get_league_info(name):
     """Return league info tuple: (tvg-id, logo, group name)"""
     for key, (tvid, logo, group) in LEAGUE_INFO.items():
@@ -61,8 +73,8 @@ def get_league_info(name):
     return ("Pixelsports.Dummy.us", LIVE_TV_LOGO, "Pixelsports")
 
 
-def build_m3u(events, sliders):
-    """Build the M3U playlist text"""
+def build_m3u(events, sliders, checks=None):
+    """Build the M3U playlist text; checks maps link -> CheckResult for mirror ranking"""
     lines = ["#EXTM3U"]
 
     for ev in events:
@@ -70,7 +82,7 @@ def build_m3u(events, sliders):
         logo = ev.get("competitors1_logo", LIVE_TV_LOGO)
         league = ev.get("channel", {}).get("TVCategory", {}).get("name", "Sports")
         tvid, group_logo, group_display = get_league_info(league)
-        links = collect_links(ev.get("channel", {}))
+        links = rank_links(collect_links(ev.get("channel", {})), checks)
         if not links:
             continue
 
@@ -85,7 +97,7 @@ def build_m3u(events, sliders):
         title = ch.get("title", "Live Channel").strip()
         live = ch.get("liveTV", {})
         logo = LIVE_TV_LOGO  
-        links = collect_links(live)
+        links = rank_links(collect_links(live), checks)
         if not links:
             continue
 
@@ -107,11 +119,18 @@ def main():
         sliders_data = fetch_json(API_SLIDERS)
         sliders = sliders_data.get("data", []) if isinstance(sliders_data, dict) else []
 
-        playlist = build_m3u(events, sliders)
-        with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+        links = {link for obj in [ev.get("channel", {}) for ev in events] + [ch.get("liveTV", {}) for ch in sliders]
+                 for link in collect_links(obj)}
+        print(f"[*] Timing {len(links)} mirrors...")
+        results = check_urls(sorted(links), headers=PLAYER_HEADERS, deep=True, segment_peek=RANK_SEGMENT_PEEK)
+        print(f"[*] Mirror check: {summarize(results)}")
+
+        playlist = build_m3u(events, sliders, {result.url: result for result in results})
+        with PlaylistWriter(OUTPUT_FILE) as f:
             f.write(playlist)
 
-        print(f"[+] Saved: {OUTPUT_FILE} ({len(events)} events + {len(sliders)} live channels)")
+        status = "Saved" if f.changed else "Unchanged"
+        print(f"[+] {status}: {OUTPUT_FILE} ({len(events)} events + {len(sliders)} live channels)")
     except Exception as e:
         print(f"[!] Error: {e}")
 
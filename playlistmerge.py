@@ -0,0 +1,421 @@
+import heapq
+import json
+import os
+import random
+import re
+import sys
+import time
+from array import array
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeout
+from datetime import datetime
+from hosthealth import HOSTS
+from httpsession import CircuitOpenError, new_session
+from m3u import ChannelTable, PlaylistWriter, parse_m3u
+
+MERGED_PLAYLIST_URLS = [
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/main/DrewAll.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/main/JapanTV.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/main/PlexTV.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/main/PlutoTV.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/main/DrewLiveVOD.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/main/TVPass.m3u",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/main/Radio.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/main/TheTVApp.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/main/LGTV.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/LocalNowTV.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/PPVLand.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/main/SamsungTVPlus.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/main/Xumo.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/MoveOnJoy.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/A1x.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/StreamedSU.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/SportsWebcast.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/TubiTV.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/DaddyLiveEvents.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/DaddyLive.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/Roku.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/Pixelsports.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/AriaPlus.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/Roxiestreams.m3u8"
+]
+
+DREWLIVE_PLAYLIST_URLS = [
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/main/DrewAll.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/main/JapanTV.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/main/PlexTV.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/main/PlutoTV.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/main/TVPass.m3u",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/main/Radio.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/main/TheTVApp.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/main/LGTV.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/LocalNowTV.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/main/SamsungTVPlus.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/main/Xumo.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/MoveOnJoy.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/A1x.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/TubiTV.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/DaddyLiveEvents.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/DaddyLive.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/Roku.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/PPVLand.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/Roxiestreams.m3u8",
+    "https://raw.githubusercontent.com/Drewski2423/DrewLive/refs/heads/main/AriaPlus.m3u8",
+    "https://github.com/Drewski2423/DrewLive/raw/refs/heads/main/MadTitan.m3u8",
+    "http://drewlive24.duckdns.org:8081/SlingTV.m3u8"
+]
+
+EPG_URL = "https://github.com/Drewski2423/DrewLive/raw/refs/heads/main/DrewLive.xml.gz"
+
+# A profile with a shard_dir also gets one playlist per group-title under
+# <shard_dir>/groups, one per source prefix ("PPVLand - NFL Action" -> PPVLand)
+# under <shard_dir>/sources, and <shard_dir>/index.json listing them.
+SHARD_KINDS = ("groups", "sources")
+SHARD_MANIFEST = "index.json"
+SOURCE_PREFIX_SEPARATOR = " - "
+
+MAX_WORKERS = 8
+FETCH_DEADLINE = 90  # seconds for the whole fetch stage, not per source
+RETRY_DELAY = 1
+
+# Sources published from this repo are read from the checkout instead of the CDN.
+LOCAL_SOURCES = True
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+SAME_REPO_URL = re.compile(
+    r"^https://(?:raw\.githubusercontent\.com/Drewski2423/DrewLive/|github\.com/Drewski2423/DrewLive/raw/)"
+    r"(?:refs/heads/)?main/([^?#]+)$"
+)
+
+# One keep-alive pool shared by every worker; most sources live on the same host.
+SESSION = new_session(pool_size=MAX_WORKERS)
+SESSION.headers["User-Agent"] = "Mozilla/5.0"
+
+# Deny lists per content filter rule. A profile names the rules it applies; all of
+# their keywords are compiled into one matcher so each entry is scanned once.
+FILTER_RULES = {
+    "nsfw": ["nsfw", "xxx", "porn", "adult"],
+}
+
+# Each profile is one output built from the shared pool of fetched sources. Sources
+# are listed in priority order: when dedup is on, the first source carrying a
+# stream keeps its metadata and later copies are dropped.
+PROFILES = {
+    "merged": {
+        "sources": MERGED_PLAYLIST_URLS,
+        "filters": [],
+        "dedup": True,
+        "output": "MergedPlaylist.m3u8",
+        "shard_dir": "shards",
+    },
+    "clean": {
+        "sources": MERGED_PLAYLIST_URLS,
+        "filters": ["nsfw"],
+        "dedup": True,
+        "output": "MergedCleanPlaylist.m3u8",
+        "shard_dir": None,
+    },
+    "drewlive": {
+        "sources": DREWLIVE_PLAYLIST_URLS,
+        "filters": [],
+        "dedup": True,
+        "output": "DrewLiveMergedPlaylist.m3u8",
+        "shard_dir": None,
+    },
+}
+
+def fetch_playlist(url, deadline, retries=3, timeout=30):
+    for attempt in range(1, retries + 1):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            print(f"⏰ Fetch deadline reached before {url} (try {attempt}).")
+            break
+        try:
+            print(f"Attempting to fetch {url} (try {attempt})...")
+            res = SESSION.get(url, timeout=min(timeout, remaining))
+            res.raise_for_status()
+            print(f"✅ Successfully fetched {url}")
+            return res.text.strip().splitlines()
+        except CircuitOpenError as e:
+            print(f"⛔ {e}, skipping {url}.")
+            return []
+        except Exception as e:
+            print(f"❌ Attempt {attempt} failed for {url}: {e}")
+            if attempt < retries:
+                backoff = RETRY_DELAY * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                time.sleep(max(0, min(backoff, deadline - time.monotonic())))
+    print(f"⚠️ Skipping {url} after {retries} failed attempts.")
+    return []
+
+def parse_playlist(lines, source_url="Unknown"):
+    parsed_channels = list(parse_m3u(lines, source_url))
+    print(f"✅ Parsed {len(parsed_channels)} valid channels from {source_url}.")
+    return parsed_channels
+
+def trie_pattern(words):
+    """Regex for any of words with shared prefixes factored out, so the engine branches
+    once per character instead of retrying every keyword at each position."""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = None
+
+    def build(node):
+        if list(node) == [""]:
+            return ""
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+class KeywordFilter:
+    """Drops entries whose EXTINF, headers or URL contain a deny-listed keyword.
+
+    Keywords from every rule share one compiled matcher; removals are counted per rule.
+    """
+
+    def __init__(self, rule_names):
+        self.rule_for = {}
+        for rule in rule_names:
+            for keyword in FILTER_RULES[rule]:
+                self.rule_for.setdefault(keyword.lower(), rule)
+        self.regex = re.compile(trie_pattern(self.rule_for)) if self.rule_for else None
+        self.removed = Counter()
+
+    def match(self, extinf, url, headers):
+        """Name of the rule the entry trips, or None."""
+        if self.regex is None:
+            return None
+        hit = self.regex.search("\n".join((extinf, url, *headers)).lower())
+        if hit is None:
+            return None
+        rule = self.rule_for[hit.group(0)]
+        self.removed[rule] += 1
+        return rule
+
+def write_entries(out, table, rows):
+    """Write rows in order under #EXTGRP headers; returns how many were written."""
+    current_group = None
+    count = 0
+    for row in rows:
+        count += 1
+        group = table.group_name(row)
+        if group != current_group:
+            out.write_line()
+            out.write_line(f'#EXTGRP:{group}')
+            current_group = group
+
+        out.write_line(table.extinf[row])
+        for hdr_line in table.header_lines(row):
+            out.write_line(hdr_line)
+        out.write_line(table.url[row])
+    return count
+
+def shard_slug(name):
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-") or "other"
+
+def source_prefix(group):
+    prefix, separator, _ = group.partition(SOURCE_PREFIX_SEPARATOR)
+    return prefix.strip() if separator else None
+
+def collect_shard_rows(table, rows, shard_rows):
+    """Pass rows through unchanged while filing each under its group and source-prefix shard,
+    so the shards are bucketed in the same pass that writes the merged playlist."""
+
+    def add(kind, name, row):
+        names, shard = shard_rows[kind].setdefault(shard_slug(name), (set(), array("I")))
+        names.add(name)
+        shard.append(row)
+
+    for row in rows:
+        group = table.group_name(row)
+        add("groups", group, row)
+        prefix = source_prefix(group)
+        if prefix:
+            add("sources", prefix, row)
+        yield row
+
+def write_shards(table, shard_rows, shard_dir):
+    """Write the per-group and per-source-prefix playlists filed by collect_shard_rows.
+
+    Shards go through PlaylistWriter, so unchanged shards keep their bytes (and mtime);
+    shards for groups that disappeared are deleted.
+    """
+    manifest = {}
+    changed = 0
+    for kind, shards in shard_rows.items():
+        kind_dir = os.path.join(shard_dir, kind)
+        os.makedirs(kind_dir, exist_ok=True)
+        entries = []
+        for slug, (names, shard) in sorted(shards.items()):
+            path = os.path.join(kind_dir, f"{slug}.m3u8")
+            with PlaylistWriter(path) as out:
+                out.write_line(f'#EXTM3U url-tvg="{EPG_URL}"')
+                write_entries(out, table, shard)
+            changed += out.changed
+            entries.append({
+                "name": min(names),
+                "file": f"{kind}/{slug}.m3u8",
+                "entries": len(shard),
+                "sha256": out.sha256,
+            })
+        manifest[kind] = entries
+
+        wanted = {f"{slug}.m3u8" for slug in shards}
+        for stale in sorted(set(os.listdir(kind_dir)) - wanted):
+            if stale.endswith(".m3u8"):
+                os.remove(os.path.join(kind_dir, stale))
+                print(f"🧹 Removed stale shard {kind}/{stale}")
+
+    with PlaylistWriter(os.path.join(shard_dir, SHARD_MANIFEST)) as out:
+        out.write(json.dumps(manifest, indent=1, ensure_ascii=False) + "\n")
+    total = sum(len(entries) for entries in manifest.values())
+    print(f"🧩 Wrote {total} shards to {shard_dir}/ ({changed} changed).")
+
+def write_merged_playlist(table, streams, sort_key, output_file, duplicates_skipped=None, shard_dir=None):
+    """K-way merge the per-source sorted row streams straight into the playlist writer."""
+    rows = heapq.merge(*streams, key=sort_key)
+    shard_rows = None
+    if shard_dir:
+        shard_rows = {kind: {} for kind in SHARD_KINDS}
+        rows = collect_shard_rows(table, rows, shard_rows)
+
+    with PlaylistWriter(output_file) as out:
+        out.write_line(f'#EXTM3U url-tvg="{EPG_URL}"')
+        total_channels_written = write_entries(out, table, rows)
+
+    if out.changed:
+        print(f"\n✅ Merged playlist written to {output_file}.")
+    else:
+        print(f"\n⏸️ {output_file} unchanged; left as is.")
+    if duplicates_skipped is not None:
+        print(f"📊 Total unique channels merged: {total_channels_written}.")
+        print(f"🗑️ Duplicates skipped: {duplicates_skipped}.")
+    else:
+        print(f"📊 Total channels merged (including duplicates): {total_channels_written}.")
+    print(f"📝 Total lines in output file: {out.line_count}.")
+
+    if shard_dir:
+        write_shards(table, shard_rows, shard_dir)
+
+def resolve_local_source(url):
+    """Path of the checked-out file a same-repo URL points at, or None for external sources."""
+    if not LOCAL_SOURCES:
+        return None
+    match = SAME_REPO_URL.match(url)
+    if not match:
+        return None
+    path = os.path.realpath(os.path.join(REPO_ROOT, match.group(1)))
+    if not path.startswith(REPO_ROOT + os.sep) or not os.path.isfile(path):
+        return None
+    return path
+
+def read_local_playlist(url, path):
+    """Stream-parse the checked-out copy line by line; None if it cannot be read."""
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            print(f"📁 Reading {url} from local checkout ({os.path.relpath(path, REPO_ROOT)})")
+            return parse_playlist(f, source_url=url)
+    except OSError as e:
+        print(f"❌ Could not read local copy {path} for {url}: {e}")
+        return None
+
+def fetch_source(url, deadline):
+    channels = None
+    path = resolve_local_source(url)
+    if path:
+        channels = read_local_playlist(url, path)
+    if channels is None:
+        lines = fetch_playlist(url, deadline)
+        channels = parse_playlist(lines, source_url=url) if lines else []
+    return channels
+
+def fetch_sources(urls):
+    """Fetch and parse every distinct source URL exactly once, concurrently, within FETCH_DEADLINE.
+
+    Entries land in one shared ChannelTable as each source completes; returns the
+    table and each source's row range.
+    """
+    urls = list(dict.fromkeys(urls))
+    deadline = time.monotonic() + FETCH_DEADLINE
+    executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    futures = {executor.submit(fetch_source, url, deadline): url for url in urls}
+    table = ChannelTable()
+    source_rows = dict.fromkeys(urls, range(0))
+    try:
+        for future in as_completed(futures, timeout=max(0, deadline - time.monotonic())):
+            source_rows[futures[future]] = table.extend(future.result())
+    except FuturesTimeout:
+        for future, url in futures.items():
+            if not future.done():
+                print(f"⏰ {url} did not finish before the fetch deadline; skipping.")
+    executor.shutdown(wait=False, cancel_futures=True)
+    return table, source_rows
+
+def sort_sources(table, source_rows):
+    """Each source's rows in output order; sources already grouped sort in near-linear time."""
+    sort_key = table.sort_key()
+    return sort_key, {url: array("I", sorted(rows, key=sort_key)) for url, rows in source_rows.items()}
+
+def dedup_streams(table, urls, source_rows, keep):
+    """Keep the first (highest-priority) copy of each stream identity; report per-source ratios."""
+    seen = set()
+    duplicates_skipped = 0
+    for url in urls:
+        considered = dropped = 0
+        for row in source_rows[url]:
+            if not keep[row]:
+                continue
+            considered += 1
+            identity = table.identity(row)
+            if identity in seen:
+                keep[row] = 0
+                dropped += 1
+            else:
+                seen.add(identity)
+        if considered:
+            print(f"🔁 {url.rsplit('/', 1)[-1]}: {dropped}/{considered} duplicates ({dropped / considered:.1%})")
+        duplicates_skipped += dropped
+    return duplicates_skipped
+
+def build_profile(name, profile, table, source_rows, sort_key, sorted_rows):
+    print(f"\n🧩 Building profile '{name}' -> {profile['output']}")
+    urls = list(dict.fromkeys(profile["sources"]))
+    # Filters run in playlist order so dedup keeps the first occurrence; the mask
+    # then selects from each source's pre-sorted rows.
+    keep = bytearray(b"\x01") * len(table)
+
+    if profile["filters"]:
+        content_filter = KeywordFilter(profile["filters"])
+        for url in urls:
+            for row in source_rows[url]:
+                if content_filter.match(table.extinf[row], table.url[row], table.header_lines(row)):
+                    keep[row] = 0
+        for rule in profile["filters"]:
+            print(f"\n🗑️ Filter '{rule}' removed {content_filter.removed[rule]} channels.")
+
+    duplicates_skipped = None
+    if profile["dedup"]:
+        duplicates_skipped = dedup_streams(table, urls, source_rows, keep)
+
+    streams = [(row for row in sorted_rows[url] if keep[row]) for url in urls]
+    write_merged_playlist(table, streams, sort_key, profile["output"], duplicates_skipped, profile["shard_dir"])
+
+def run(profile_names=None):
+    """Fetch the union of the selected profiles' sources once, then fan out to every output."""
+    profile_names = profile_names or list(PROFILES)
+    print(f"Starting playlist merge at {datetime.now()}...")
+    selected = [(name, PROFILES[name]) for name in profile_names]
+    table, source_rows = fetch_sources(url for _, profile in selected for url in profile["sources"])
+    sort_key, sorted_rows = sort_sources(table, source_rows)
+    for name, profile in selected:
+        build_profile(name, profile, table, source_rows, sort_key, sorted_rows)
+    if HOSTS.summary():
+        print(HOSTS.summary())
+    print(f"Merging complete at {datetime.now()}.")
+
+if __name__ == "__main__":
+    run(sys.argv[1:])
@@ -2,8 +2,12 @@ import asyncio
 from playwright.async_api import async_playwright
 import aiohttp
 from datetime import datetime
+from m3u import PlaylistWriter
+from streamcheck import RANK_SEGMENT_PEEK, StreamChecker, rank_mirrors, startup_time, throughput
 
 API_URL = "https://ppv.to/api/streams"
+# Follow each stream's HLS playlist down to its first segment instead of trusting the status.
+DEEP_CHECK = True
 
 CUSTOM_HEADERS = [
     '#EXTVLCOPT:http-origin=https://ppv.to',
@@ -91,26 +95,13 @@ COLLEGE_TEAMS = {
     "arizona state sun devils", "texas tech red raiders", "florida atlantic owls"
 }
 
-# --- CORRECTED FUNCTION #1 ---
-async def check_m3u8_url(url, referer):
-    """Checks the M3U8 URL using the correct referer for validation."""
-    try:
-        # Dynamically generate the origin from the referer URL
-        origin = "https://" + referer.split('/')[2]
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:143.0) Gecko/20100101 Firefox/143.0",
-            "Referer": referer,
-            "Origin": origin
-        }
-        timeout = aiohttp.ClientTimeout(total=15)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.get(url, headers=headers) as resp:
-                # A 200 (OK) or 403 (Forbidden) can both indicate a working link,
-                # as some servers block direct file access but confirm the path exists.
-                return resp.status in [200, 403]
-    except Exception as e:
-        print(f"❌ Error checking {url}: {e}")
-        return False
+def check_headers(referer):
+    """Headers for validating a stream: the iframe page as referer, its host as origin."""
+    return {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:143.0) Gecko/20100101 Firefox/143.0",
+        "Referer": referer,
+        "Origin": "https://" + referer.split('/')[2],
+    }
 
 async def get_streams():
     try:
@@ -132,7 +123,7 @@ async def get_streams():
         return None
 
 # --- CORRECTED FUNCTION #2 ---
-async def grab_m3u8_from_iframe(page, iframe_url):
+async def grab_m3u8_from_iframe(page, iframe_url, checker):
     found_streams = set()
     def handle_response(response):
         if ".m3u8" in response.url:
@@ -146,7 +137,7 @@ async def grab_m3u8_from_iframe(page, iframe_url):
     except Exception as e:
         print(f"❌ Failed to load iframe page: {e}")
         page.remove_listener("response", handle_response)
-        return set()
+        return []
 
     try:
         await page.wait_for_timeout(5000)
@@ -168,19 +159,23 @@ async def grab_m3u8_from_iframe(page, iframe_url):
 
     if not found_streams:
         print(f"❌ No M3U8 URLs were captured for {iframe_url}")
-        return set()
+        return []
 
-    valid_urls = set()
+    valid_urls = []
     # Pass the correct iframe_url as the referer to the check function
-    tasks = [check_m3u8_url(url, iframe_url) for url in found_streams]
-    results = await asyncio.gather(*tasks)
-    
-    for url, is_valid in zip(found_streams, results):
-        if is_valid:
-            valid_urls.add(url)
+    headers = check_headers(iframe_url)
+    results = await checker.check_many([(url, headers) for url in sorted(found_streams)])
+
+    # Fastest mirror first, so the playlist points players at the quickest origin
+    for result in rank_mirrors(results):
+        if result.ok:
+            print(f"⚡ {startup_time(result):.2f}s est. startup ({throughput(result) / 1024:.0f} KiB/s): {result.url}")
+            valid_urls.append(result.url)
         else:
-            print(f"🗑️ Discarding invalid or unreachable URL: {url}")
-            
+            if result.error:
+                print(f"❌ Error checking {result.url}: {result.error}")
+            print(f"🗑️ Discarding invalid or unreachable URL: {result.url}")
+
     return valid_urls
 
 async def grab_live_now_from_html(page, base_url="https://ppv.to/"):
@@ -248,7 +243,7 @@ def build_m3u(streams, url_map):
                         matched_team = team
                         break
 
-        url = next(iter(urls))
+        url = urls[0]
         lines.append(f'#EXTINF:-1 tvg-id="{tvg_id}" tvg-logo="{logo}" group-title="{final_group}",{s["name"]}')
         lines.extend(CUSTOM_HEADERS)
         lines.append(url)
@@ -290,7 +285,10 @@ async def main():
             deduped_streams.append(s)
     streams = deduped_streams
 
-    async with async_playwright() as p:
+    # Without DEEP_CHECK a 200 (OK) or 403 (Forbidden) can both indicate a working link,
+    # as some servers block direct file access but confirm the path exists.
+    async with async_playwright() as p, StreamChecker(ok_statuses={200, 403}, timeout=15, deep=DEEP_CHECK,
+                                                          segment_peek=RANK_SEGMENT_PEEK) as checker:
         # For debugging, you can set headless=False to watch the browser
         browser = await p.firefox.launch(headless=True)
         context = await browser.new_context()
@@ -301,7 +299,7 @@ async def main():
         for idx, s in enumerate(streams, start=1):
             key = f"{s['name']}::{s['category']}::{s['iframe']}"
             print(f"\n🔎 Scraping stream {idx}/{total_streams}: {s['name']} ({s['category']})")
-            urls = await grab_m3u8_from_iframe(page, s["iframe"])
+            urls = await grab_m3u8_from_iframe(page, s["iframe"], checker)
             if urls:
                 print(f"✅ Got {len(urls)} stream(s) for {s['name']} ({idx}/{total_streams})")
             else:
@@ -312,7 +310,7 @@ async def main():
         live_now_streams = await grab_live_now_from_html(page)
         for s in live_now_streams:
             key = f"{s['name']}::{s['category']}::{s['iframe']}"
-            urls = await grab_m3u8_from_iframe(page, s["iframe"])
+            urls = await grab_m3u8_from_iframe(page, s["iframe"], checker)
             if urls:
                 print(f"✅ Got {len(urls)} 'Live Now' stream(s) for {s['name']}")
             else:
@@ -324,9 +322,12 @@ async def main():
 
     print("\n💾 Writing final playlist to PPVLand.m3u8 ...")
     playlist = build_m3u(streams, url_map)
-    with open("PPVLand.m3u8", "w", encoding="utf-8") as f:
+    with PlaylistWriter("PPVLand.m3u8") as f:
         f.write(playlist)
-    print(f"✅ Done! Playlist saved as PPVLand.m3u8 at {datetime.utcnow().isoformat()} UTC")
+    if f.changed:
+        print(f"✅ Done! Playlist saved as PPVLand.m3u8 at {datetime.utcnow().isoformat()} UTC")
+    else:
+        print(f"⏸️ Done! PPVLand.m3u8 unchanged at {datetime.utcnow().isoformat()} UTC")
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,9 +1,11 @@
-import requests
 import re
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 from requests.exceptions import RequestException
 import logging
+from httpsession import new_session
+from m3u import PlaylistWriter
+from streamcheck import LivenessCache, check_urls, summarize
 
 BASE_URL = "https://roxiestreams.cc"
 
@@ -24,7 +26,7 @@ TV_INFO = {
 DISCOVERY_KEYWORDS = list(TV_INFO.keys()) + ['streams']
 SECTION_BLOCKLIST = ['olympia']
 
-SESSION = requests.Session()
+SESSION = new_session()
 SESSION.headers.update({
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
     'Referer': BASE_URL
@@ -108,13 +110,13 @@ def extract_m3u8_links(page_url):
     return links
 
 
-def check_stream_status(m3u8_url):
-    """Validates a .m3u8 stream."""
-    try:
-        resp = SESSION.head(m3u8_url, timeout=5, allow_redirects=True)
-        return resp.status_code == 200
-    except RequestException:
-        return False
+def check_stream_statuses(m3u8_urls):
+    """Validates .m3u8 streams concurrently; returns the set of live URLs."""
+    cache = LivenessCache()
+    results = check_urls(m3u8_urls, timeout=5, headers=dict(SESSION.headers), cache=cache)
+    cache.close()
+    logging.info(f"Stream check: {summarize(results)}; {cache.summary()}")
+    return {result.url for result in results if result.ok}
 
 
 def get_tv_info(url):
@@ -135,6 +137,7 @@ def main():
 
     logging.info(f"Found {len(sections)} sections. Scraping for events...")
 
+    section_events = []
     for section_url, section_title in sections:
         logging.info(f"\n--- Processing Section: {section_title} ({section_url}) ---")
 
@@ -145,13 +148,19 @@ def main():
             logging.info(f"  No event sub-pages found. Scraping directly.")
             event_links = {(section_url, section_title)}
 
-        valid_count = 0
+        events = []
         for event_url, event_title in event_links:
             logging.info(f"  Scraping: {event_title}")
-            m3u8_links = extract_m3u8_links(event_url)
+            events.append((event_title, extract_m3u8_links(event_url)))
+        section_events.append((tv_id, logo, group_name, events))
 
+    live_links = check_stream_statuses(sorted({link for *_, events in section_events for _, links in events for link in links}))
+
+    for tv_id, logo, group_name, events in section_events:
+        valid_count = 0
+        for event_title, m3u8_links in events:
             for link in m3u8_links:
-                if check_stream_status(link):
+                if link in live_links:
                     playlist_lines.append(
                         f'#EXTINF:-1 tvg-logo="{logo}" tvg-id="{tv_id}" group-title="Roxiestreams - {group_name}",{event_title}'
                     )
@@ -162,10 +171,13 @@ def main():
 
     output_filename = "Roxiestreams.m3u8"
     try:
-        with open(output_filename, "w", encoding="utf-8") as f:
+        with PlaylistWriter(output_filename) as f:
             f.write("\n".join(playlist_lines))
         logging.info(f"\n--- SUCCESS ---")
-        logging.info(f"Playlist saved as {output_filename}")
+        if f.changed:
+            logging.info(f"Playlist saved as {output_filename}")
+        else:
+            logging.info(f"{output_filename} unchanged; nothing written")
         logging.info(f"Total valid streams found: {(len(playlist_lines) - 1) // 2}")
     except IOError as e:
         logging.error(f"Failed to write file {output_filename}: {e}")
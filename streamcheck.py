@@ -0,0 +1,362 @@
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from collections import namedtuple
+from urllib.parse import urljoin, urlsplit
+
+import aiohttp
+from hosthealth import HOSTS
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:143.0) Gecko/20100101 Firefox/143.0"
+MAX_IN_FLIGHT = 64
+MAX_PER_HOST = 6
+CHECK_TIMEOUT = 10
+CHECK_DEADLINE = 180  # seconds for a whole check_many() batch
+PEEK_BYTES = 4096
+OK_STATUSES = frozenset({200})
+
+# Deep HLS checks: bytes one stream may cost across master, media playlist and segment.
+HLS_BYTE_BUDGET = 256 * 1024
+SEGMENT_PEEK = 2048
+SEGMENT_STATUSES = frozenset({200, 206})
+
+# Mirror ranking: sample this much of a segment, then estimate how long a player needs
+# to fetch STARTUP_BYTES from each candidate.
+RANK_SEGMENT_PEEK = 64 * 1024
+STARTUP_BYTES = 512 * 1024
+bandwidth_regex = re.compile(r'(?<![-\w])BANDWIDTH=(\d+)')
+
+CACHE_DIR = "stream_cache"
+CACHE_FILE = os.path.join(CACHE_DIR, "liveness.sqlite")
+OK_TTL = 3 * 3600  # live streams are re-probed after this many seconds
+FAIL_TTL = 20 * 60  # dead or unreachable ones sooner, in case they come back
+# Outcomes that say nothing about the stream itself and are never cached.
+UNCACHED_ERRORS = frozenset({"deadline"})
+CACHE_VERSION = 3
+MIN_TRANSFER_TIME = 0.001
+
+# ttfb is seconds until the first body bytes (headers for HEAD); bytes is how much was
+# read and elapsed how long the whole check took. sample_ttfb and sample_rate (bytes/s)
+# time the media actually sampled on their own: the first segment for deep checks, the
+# body peek for GET checks.
+CheckResult = namedtuple("CheckResult", "url ok status ttfb bytes error elapsed sample_ttfb sample_rate")
+
+def failed_check(url, error):
+    return CheckResult(url, False, None, None, 0, error, None, None, None)
+
+def sample_rate(received, ttfb, elapsed):
+    """Bytes per second after the first byte arrived."""
+    return received / max(elapsed - ttfb, MIN_TRANSFER_TIME) if received else None
+
+def hls_variants(text, base_url):
+    """(bandwidth, url) for every #EXT-X-STREAM-INF entry of a master playlist."""
+    variants = []
+    bandwidth = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXT-X-STREAM-INF"):
+            match = bandwidth_regex.search(line)
+            bandwidth = int(match.group(1)) if match else 0
+        elif line and not line.startswith("#") and bandwidth is not None:
+            variants.append((bandwidth, urljoin(base_url, line)))
+            bandwidth = None
+    return variants
+
+def hls_first_segment(text, base_url):
+    """URL of the first media segment listed in a media playlist, or None."""
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            return urljoin(base_url, line)
+    return None
+
+class LivenessCache:
+    """On-disk check results keyed by method, URL and request headers.
+
+    Passing results are reused for ok_ttl seconds and failing ones for fail_ttl;
+    expired rows are dropped when the cache is opened. Deadline results are never
+    stored since they say nothing about the stream.
+    """
+
+    def __init__(self, path=CACHE_FILE, ok_ttl=OK_TTL, fail_ttl=FAIL_TTL):
+        self.path = path
+        self.ok_ttl = ok_ttl
+        self.fail_ttl = fail_ttl
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path)
+        with self._db:
+            if self._db.execute("PRAGMA user_version").fetchone()[0] != CACHE_VERSION:
+                self._db.execute("DROP TABLE IF EXISTS liveness")
+                self._db.execute(f"PRAGMA user_version = {CACHE_VERSION}")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS liveness (key TEXT PRIMARY KEY, url TEXT, status INTEGER,"
+                " ttfb REAL, bytes INTEGER, error TEXT, elapsed REAL, sample_ttfb REAL, sample_rate REAL,"
+                " ok INTEGER, expires REAL)"
+            )
+            self._db.execute("DELETE FROM liveness WHERE expires <= ?", (time.time(),))
+
+    @staticmethod
+    def key(method, url, headers):
+        text = "\n".join([method, url] + [f"{k.lower()}: {v}" for k, v in sorted(headers.items(), key=lambda h: h[0].lower())])
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """{key: CheckResult} for the keys with an unexpired entry; counts hits and misses."""
+        found = {}
+        now = time.time()
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            rows = self._db.execute(
+                f"SELECT key, url, ok, status, ttfb, bytes, error, elapsed, sample_ttfb, sample_rate FROM liveness"
+                f" WHERE expires > ? AND key IN ({','.join('?' * len(chunk))})",
+                (now, *chunk),
+            )
+            for key, url, ok, *fields in rows:
+                found[key] = CheckResult(url, bool(ok), *fields)
+        self.hits += sum(1 for key in keys if key in found)
+        self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, entries):
+        """Store (key, CheckResult) pairs with the TTL their outcome calls for."""
+        now = time.time()
+        rows = [
+            (key, r.url, r.status, r.ttfb, r.bytes, r.error, r.elapsed, r.sample_ttfb, r.sample_rate, int(r.ok),
+             now + (self.ok_ttl if r.ok else self.fail_ttl))
+            for key, r in entries
+            if r.error not in UNCACHED_ERRORS
+        ]
+        with self._db:
+            self._db.executemany("INSERT OR REPLACE INTO liveness VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self):
+        return f"{self.hits}/{self.hits + self.misses} cached ({self.hit_rate():.0%} hit rate)"
+
+    def close(self):
+        self._db.close()
+
+class StreamChecker:
+    """Async liveness checker sharing one pooled session.
+
+    Concurrency is capped globally (max_in_flight) and per host (max_per_host), and a
+    check_many() batch finishes within deadline seconds however many URLs it holds.
+    GET checks read at most peek_bytes of the body, enough to time the first byte
+    without downloading the stream. With a LivenessCache, check_many() only probes
+    URLs whose cached result has expired.
+
+    deep=True validates HLS instead of trusting the status code: the playlist must
+    return 200 and parse, the lowest-bandwidth variant of a master playlist is
+    followed to its media playlist, and the first segment_peek bytes of the first
+    segment must answer a ranged GET. The whole chain shares one timeout and reads at
+    most byte_budget bytes.
+
+    Timeouts adapt to each host's latency history in health (timeout is the ceiling).
+    Only answered checks feed that history: one dead stream says nothing about the other
+    streams on its host, so checks never count as host failures or consult the breaker.
+    """
+
+    def __init__(self, method="GET", ok_statuses=OK_STATUSES, timeout=CHECK_TIMEOUT,
+                 deadline=CHECK_DEADLINE, max_in_flight=MAX_IN_FLIGHT,
+                 max_per_host=MAX_PER_HOST, peek_bytes=PEEK_BYTES, headers=None, cache=None,
+                 deep=False, byte_budget=HLS_BYTE_BUDGET, segment_peek=SEGMENT_PEEK, health=HOSTS):
+        self.method = method
+        self.ok_statuses = frozenset(ok_statuses)
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_in_flight = max_in_flight
+        self.max_per_host = max_per_host
+        self.peek_bytes = peek_bytes
+        self.headers = {"User-Agent": USER_AGENT, **(headers or {})}
+        self.cache = cache
+        self.deep = deep
+        self.byte_budget = byte_budget
+        self.segment_peek = segment_peek
+        self.health = health
+        self.session = None
+        self._host_slots = {}
+
+    async def __aenter__(self):
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight, limit_per_host=self.max_per_host, ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(connector=connector, headers=self.headers)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+        return False
+
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.max_per_host)
+        return slot
+
+    async def check(self, url, headers=None, expires=None):
+        async with self._host_slot(url), self._in_flight:
+            remaining = self.timeout if expires is None else expires - time.monotonic()
+            if remaining <= 0:
+                return failed_check(url, "deadline")
+            limit = self.health.timeout(url, self.timeout, round_trips=3 if self.deep else 1)
+            timeout = aiohttp.ClientTimeout(total=min(limit, remaining))
+            start = time.monotonic()
+            try:
+                if self.deep:
+                    result = await asyncio.wait_for(self._check_hls(url, headers, timeout), timeout.total)
+                    self.health.success(url, result.ttfb)
+                    return result
+                async with self.session.request(self.method, url, headers=headers, timeout=timeout, allow_redirects=True) as resp:
+                    ttfb = None
+                    received = 0
+                    if self.method != "HEAD" and self.peek_bytes:
+                        ttfb, received, _ = await self._peek(resp, self.peek_bytes, start)
+                    ttfb = ttfb or time.monotonic() - start
+                    elapsed = time.monotonic() - start
+                    ok = resp.status in self.ok_statuses
+                    self.health.success(url, ttfb)
+                    return CheckResult(url, ok, resp.status, ttfb, received, None, elapsed,
+                                       ttfb, sample_rate(received, ttfb, elapsed))
+            except asyncio.TimeoutError:
+                return failed_check(url, "timeout")
+            except Exception as e:
+                return failed_check(url, type(e).__name__)
+
+    @staticmethod
+    async def _peek(resp, limit, start):
+        """Read up to limit body bytes; returns (seconds to the first chunk, bytes read,
+        seconds to the last one), both timed from start."""
+        chunk = await resp.content.read(limit)
+        ttfb = time.monotonic() - start
+        received = len(chunk)
+        while chunk and received < limit:
+            chunk = await resp.content.read(limit - received)
+            received += len(chunk)
+        return ttfb, received, time.monotonic() - start
+
+    @staticmethod
+    async def _read_lines(resp, limit):
+        """Read the body until EOF or limit bytes; returns (complete lines, bytes read).
+
+        read(n) only returns what is buffered, so a playlist sent in small chunks needs
+        the loop. When the limit cuts the body short, the trailing partial line is
+        dropped rather than parsed as a truncated URL.
+        """
+        chunks = []
+        received = 0
+        while received < limit:
+            chunk = await resp.content.read(limit - received)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            received += len(chunk)
+        body = b"".join(chunks)
+        if received >= limit and not resp.content.at_eof():
+            body = body[:body.rfind(b"\n") + 1]
+        return body, received
+
+    async def _fetch_text(self, url, headers, timeout, budget):
+        async with self.session.get(url, headers=headers, timeout=timeout, allow_redirects=True) as resp:
+            body, received = await self._read_lines(resp, budget) if resp.status == 200 else (b"", 0)
+            return resp.status, str(resp.url), body, received
+
+    async def _check_hls(self, url, headers, timeout):
+        start = time.monotonic()
+        budget = self.byte_budget
+        status, base, body, received = await self._fetch_text(url, headers, timeout, budget)
+        ttfb = time.monotonic() - start
+        budget -= received
+
+        def result(ok, error=None, sample=(None, None)):
+            return CheckResult(url, ok, status, ttfb, self.byte_budget - budget, error,
+                               time.monotonic() - start, *sample)
+
+        if status != 200:
+            return result(False, f"playlist {status}")
+        text = body.decode("utf-8", "replace")
+        if not text.lstrip("\ufeff").startswith("#EXTM3U"):
+            return result(False, "not an HLS playlist")
+        variants = hls_variants(text, base)
+        if variants:
+            variant = min(variants)[1]
+            variant_status, base, body, received = await self._fetch_text(variant, headers, timeout, budget)
+            budget -= received
+            if variant_status != 200:
+                return result(False, f"variant {variant_status}")
+            text = body.decode("utf-8", "replace")
+        segment = hls_first_segment(text, base)
+        if segment is None:
+            return result(False, "no segments")
+        peek = min(self.segment_peek, budget)
+        if peek <= 0:
+            return result(False, "byte budget exhausted")
+        segment_headers = {**(headers or {}), "Range": f"bytes=0-{peek - 1}"}
+        segment_start = time.monotonic()
+        async with self.session.get(segment, headers=segment_headers, timeout=timeout, allow_redirects=True) as resp:
+            segment_ttfb, received, segment_elapsed = await self._peek(resp, peek, segment_start)
+            budget -= received
+            if resp.status not in SEGMENT_STATUSES or not received:
+                return result(False, f"segment {resp.status}")
+        return result(True, sample=(segment_ttfb, sample_rate(received, segment_ttfb, segment_elapsed)))
+
+    async def check_many(self, items):
+        """Check every url (or (url, headers) pair) concurrently; results keep input order."""
+        requests = [(item, None) if isinstance(item, str) else item for item in items]
+        if not requests:
+            return []
+        results = [None] * len(requests)
+        if self.cache:
+            mode = "HLS" if self.deep else self.method
+            keys = [self.cache.key(mode, url, {**self.headers, **(headers or {})}) for url, headers in requests]
+            cached = self.cache.get_many(keys)
+            results = [cached.get(key) for key in keys]
+        probe = [i for i, result in enumerate(results) if result is None]
+        if probe:
+            expires = time.monotonic() + self.deadline
+            tasks = [asyncio.ensure_future(self.check(*requests[i], expires)) for i in probe]
+            done, pending = await asyncio.wait(tasks, timeout=self.deadline + 1)
+            for task in pending:
+                task.cancel()
+            for i, task in zip(probe, tasks):
+                url = requests[i][0]
+                results[i] = task.result() if task in done else failed_check(url, "deadline")
+            if self.cache:
+                self.cache.put_many((keys[i], results[i]) for i in probe)
+        return results
+
+def check_urls(items, **options):
+    """Blocking check_many() for scripts that have no event loop of their own."""
+    async def run():
+        async with StreamChecker(**options) as checker:
+            return await checker.check_many(items)
+    return asyncio.run(run())
+
+def throughput(result):
+    """Bytes per second of the sampled media, or 0 when nothing was sampled."""
+    return result.sample_rate or 0.0
+
+def startup_time(result, startup_bytes=STARTUP_BYTES):
+    """Estimated seconds until a player has startup_bytes of media: the sample's own time
+    to first byte plus startup_bytes at the sample's throughput. Playlist fetches are left
+    out, so a mirror with a longer playlist is not mistaken for a faster one."""
+    rate = throughput(result)
+    return result.sample_ttfb + startup_bytes / rate if rate else float("inf")
+
+def rank_mirrors(results):
+    """Live candidates fastest first, then the failed ones in their original order."""
+    return sorted(results, key=lambda r: (not r.ok, startup_time(r) if r.ok else 0))
+
+def summarize(results):
+    alive = [r for r in results if r.ok]
+    ttfbs = sorted(r.ttfb for r in alive)
+    median = f", median TTFB {ttfbs[len(ttfbs) // 2] * 1000:.0f} ms" if ttfbs else ""
+    return f"{len(alive)}/{len(results)} alive{median}"
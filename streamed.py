@@ -3,6 +3,9 @@ import requests
 import sys
 import re
 import concurrent.futures
+from httpsession import new_session
+from m3u import PlaylistWriter
+from streamcheck import check_urls
 
 FALLBACK_LOGOS = {
     "american-football": "http://drewlive24.duckdns.org:9000/Logos/Am-Football2.png",
@@ -32,11 +35,13 @@ TV_IDS = {
     "Motor Sports": "Racing.Dummy.us"
 }
 
+SESSION = new_session()
+
 def get_matches(endpoint="all"):
     url = f"https://streamed.pk/api/matches/{endpoint}"
     try:
         print(f"📡 Fetching {endpoint} matches from the API...")
-        response = requests.get(url, timeout=20)
+        response = SESSION.get(url, timeout=20)
         response.raise_for_status()
         print(f"✅ Successfully fetched {endpoint} matches.")
         return response.json()
@@ -51,7 +56,7 @@ def get_stream_embed_url(source):
         if not src_name or not src_id:
             return None
         api_url = f"https://streamed.pk/api/stream/{src_name}/{src_id}"
-        response = requests.get(api_url, timeout=10)
+        response = SESSION.get(api_url, timeout=10)
         response.raise_for_status()
         streams = response.json()
         if streams and streams[0].get('embedUrl'):
@@ -78,30 +83,33 @@ def extract_m3u8_from_embed(embed_url):
     if not embed_url:
         return None
     try:
-        response = requests.get(embed_url, headers=CUSTOM_HEADERS, timeout=15)
+        response = SESSION.get(embed_url, headers=CUSTOM_HEADERS, timeout=15)
         response.raise_for_status()
         return find_m3u8_in_content(response.text)
     except:
         return None
 
-def validate_logo(url, category):
-    """Check logo URL; fallback strictly based on category."""
+def validate_logo(url, category, result):
+    """Keep a logo whose check passed; fallback strictly based on category."""
     cat = (category or "").lower().replace('-', ' ').strip()
     category_key = next((key for key in FALLBACK_LOGOS if key.lower() == cat), None)
     fallback = FALLBACK_LOGOS.get(category_key)
 
-    if url:
-        try:
-            resp = requests.head(url, timeout=5, allow_redirects=True)
-            if resp.status_code in (200, 302):
-                return url
-            else:
-                print(f"⚠️ Logo {resp.status_code}: {url} → using fallback for {category}")
-        except requests.RequestException:
+    if url and result:
+        if result.ok:
+            return url
+        elif result.status:
+            print(f"⚠️ Logo {result.status}: {url} → using fallback for {category}")
+        else:
             print(f"⚠️ Logo failed: {url} → using fallback for {category}")
 
     return fallback
 
+def check_logos(urls):
+    """HEAD every distinct logo URL in one concurrent batch; returns {url: CheckResult}."""
+    results = check_urls(sorted(set(filter(None, urls))), method="HEAD", ok_statuses={200, 302}, timeout=5)
+    return {result.url: result for result in results}
+
 def build_logo_url(match):
     api_category = (match.get('category') or '').strip()
     logo_url = None
@@ -122,7 +130,6 @@ def build_logo_url(match):
         logo_url = re.sub(r'(https://streamed\.pk/api/images/proxy/)+', 'https://streamed.pk/api/images/proxy/', logo_url)
         logo_url = re.sub(r'\.webp\.webp$', '.webp', logo_url)
 
-    logo_url = validate_logo(logo_url, api_category)
     return logo_url, api_category
 
 def process_match(match):
@@ -154,21 +161,26 @@ def generate_m3u8():
         f'#EXTVLCOPT:user-agent={CUSTOM_HEADERS["User-Agent"]}'
     ]
 
+    found = []
     with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
         futures = {executor.submit(process_match, m): m for m in matches}
         for future in concurrent.futures.as_completed(futures):
             match, url = future.result()
-            title = match.get('title', 'Untitled Match')
             if url:
-                logo, cat = build_logo_url(match)
-                display_cat = cat.replace('-', ' ').title() if cat else "General"
-                tv_id = TV_IDS.get(display_cat, "General.Dummy.us")
+                found.append((match, url, *build_logo_url(match)))
+
+    logo_checks = check_logos(logo for _, _, logo, _ in found)
+    for match, url, logo, cat in found:
+        title = match.get('title', 'Untitled Match')
+        logo = validate_logo(logo, cat, logo_checks.get(logo))
+        display_cat = cat.replace('-', ' ').title() if cat else "General"
+        tv_id = TV_IDS.get(display_cat, "General.Dummy.us")
 
-                content.append(f'#EXTINF:-1 tvg-id="{tv_id}" tvg-name="{title}" tvg-logo="{logo}" group-title="StreamedSU - {display_cat}",{title}')
-                content.extend(vlc_header_lines)
-                content.append(url)
-                success += 1
-                print(f"  ✅ {title} ({logo}) TV-ID: {tv_id}")
+        content.append(f'#EXTINF:-1 tvg-id="{tv_id}" tvg-name="{title}" tvg-logo="{logo}" group-title="StreamedSU - {display_cat}",{title}')
+        content.extend(vlc_header_lines)
+        content.append(url)
+        success += 1
+        print(f"  ✅ {title} ({logo}) TV-ID: {tv_id}")
 
     print(f"🎉 Found {success} working streams.")
     return "\n".join(content)
@@ -176,9 +188,9 @@ def generate_m3u8():
 if __name__ == "__main__":
     playlist = generate_m3u8()
     try:
-        with open("StreamedSU.m3u8", "w", encoding="utf-8") as f:
+        with PlaylistWriter("StreamedSU.m3u8") as f:
             f.write(playlist)
-        print("💾 Playlist saved successfully.")
+        print("💾 Playlist saved successfully." if f.changed else "⏸️ Playlist unchanged; nothing written.")
     except IOError as e:
         print(f"⚠️ Error saving file: {e}")
         print(playlist)
@@ -1,10 +1,13 @@
-import requests
 import re
 from datetime import datetime
+from httpsession import new_session
+from m3u import PlaylistWriter, parse_m3u
 
 UPSTREAM_URL = "http://tvpass.org/playlist/m3u"
 LOCAL_FILE = "TVPass.m3u"
 
+SESSION = new_session()
+
 LOCKED_GROUPS = {
     "ppv": {
         "tvg-id": "PPV.EVENTS.Dummy.us",
@@ -84,44 +87,25 @@ def lock_metadata(meta_line, title):
         return f'#EXTINF:-1 tvg-id="{locked["tvg-id"]}" tvg-name="{title_cased}" tvg-logo="{locked["tvg-logo"]}" group-title="{display_group}",{title_cased}'
     return meta_line
 
-def fetch_upstream_pairs():
-    res = requests.get(UPSTREAM_URL, timeout=15)
-    res.raise_for_status()
-    lines = res.text.splitlines()
+def collect_pairs(lines, source):
     pairs = []
-    i = 0
-    while i < len(lines):
-        if lines[i].startswith("#EXTINF"):
-            meta = lines[i].strip()
-            group = extract_group(meta).lower()
-            i += 1
-            if i < len(lines):
-                url = lines[i].strip()
-                title = extract_title(meta)
-                if group != "live" and not is_event_outdated(title):
-                    pairs.append((meta, url))
-        i += 1
+    for channel in parse_m3u(lines, source):
+        title = channel.title.lower()
+        if channel.group.strip().lower() != "live" and not is_event_outdated(title):
+            pairs.append((channel.extinf, channel.url))
     return pairs
 
+def fetch_upstream_pairs():
+    res = SESSION.get(UPSTREAM_URL, timeout=15)
+    res.raise_for_status()
+    return collect_pairs(res.text.splitlines(), UPSTREAM_URL)
+
 def parse_local_playlist():
     with open(LOCAL_FILE, "r", encoding="utf-8") as f:
         lines = f.read().splitlines()
 
     header = lines[0] if lines and lines[0].startswith("#EXTM3U") else "#EXTM3U"
-    pairs = []
-    i = 1
-    while i < len(lines):
-        if lines[i].startswith("#EXTINF"):
-            meta = lines[i].strip()
-            group = extract_group(meta).lower()
-            i += 1
-            if i < len(lines):
-                url = lines[i].strip()
-                title = extract_title(meta)
-                if group != "live" and not is_event_outdated(title):
-                    pairs.append((meta, url))
-        i += 1
-    return header, pairs
+    return header, collect_pairs(lines[1:], LOCAL_FILE)
 
 def update_playlist(local_pairs, upstream_pairs):
     updated = []
@@ -146,12 +130,15 @@ def update_playlist(local_pairs, upstream_pairs):
     return updated
 
 def write_playlist(header, updated_pairs):
-    with open(LOCAL_FILE, "w", encoding="utf-8") as f:
+    with PlaylistWriter(LOCAL_FILE) as f:
         f.write(header + "\n")
         for meta, url in updated_pairs:
             f.write(meta + "\n")
             f.write(url + "\n")
-    print(f"✅ Updated {LOCAL_FILE} with {len(updated_pairs)} total streams.")
+    if f.changed:
+        print(f"✅ Updated {LOCAL_FILE} with {len(updated_pairs)} total streams.")
+    else:
+        print(f"⏸️ {LOCAL_FILE} unchanged ({len(updated_pairs)} total streams).")
 
 def main():
     header, local_pairs = parse_local_playlist()
@@ -5,12 +5,16 @@ from urllib.parse import urljoin
 import aiohttp
 from bs4 import BeautifulSoup
 from playwright.async_api import BrowserContext, Page, async_playwright
+from m3u import PlaylistWriter
+from streamcheck import StreamChecker
 
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/115.0"
 DYNAMIC_WAIT_TIMEOUT = 15000
 GAME_TABLE_WAIT_TIMEOUT = 30000
 STREAM_PATTERN = re.compile(r"\.m3u8($|\?)", re.IGNORECASE)
 OUTPUT_FILE = "SportsWebcast.m3u8"
+# Follow each stream's HLS playlist down to its first segment instead of trusting a 200.
+DEEP_CHECK = True
 
 NFL_BASE_URL = "https://nflwebcast.com/"
 NHL_BASE_URL = "https://slapstreams.com/"
@@ -64,26 +68,24 @@ def normalize_game_name(original_name: str) -> str:
             return f"{team1} @ {team2}"
     return " ".join(cleaned_name.strip().split()).title()
 
-async def verify_stream_url(session: aiohttp.ClientSession, url: str, headers: Optional[Dict[str, str]] = None) -> bool:
-    request_headers = headers or {}
-    if "User-Agent" not in request_headers:
-        request_headers["User-Agent"] = session.headers.get("User-Agent", USER_AGENT)
-    try:
-        async with session.get(url, timeout=10, allow_redirects=True, headers=request_headers) as response:
-            if response.status == 200:
-                print(f" ✔️ URL Verified (200 OK): {url}")
-                return True
-            else:
-                print(f" ❌ URL Failed ({response.status}): {url}")
-                return False
-    except asyncio.TimeoutError:
-        print(f" ❌ URL Timed Out: {url}")
-        return False
-    except aiohttp.ClientError as e:
-        print(f" ❌ URL Client Error ({type(e).__name__}): {url}")
-        return False
-
-async def find_stream_from_servers_on_page(context: BrowserContext, page_url: str, base_url: str, session: aiohttp.ClientSession) -> Optional[str]:
+def report_check(result) -> bool:
+    if result.ok:
+        print(f" ✔️ URL Verified ({result.status} OK, {result.ttfb * 1000:.0f} ms): {result.url}")
+    elif result.error in ("timeout", "deadline"):
+        print(f" ❌ URL Timed Out: {result.url}")
+    elif result.status is not None:
+        print(f" ❌ URL Failed ({result.error or result.status}): {result.url}")
+    else:
+        print(f" ❌ URL Client Error ({result.error}): {result.url}")
+    return result.ok
+
+async def first_verified_url(checker: StreamChecker, urls: List[str], headers: Optional[Dict[str, str]] = None) -> Optional[str]:
+    """Checks all candidates at once and returns the first live one in the given order."""
+    results = await checker.check_many([(url, headers) for url in urls])
+    verified = [report_check(result) for result in results]
+    return next((url for url, ok in zip(urls, verified) if ok), None)
+
+async def find_stream_from_servers_on_page(context: BrowserContext, page_url: str, base_url: str, checker: StreamChecker) -> Optional[str]:
     verification_headers = {
         "Origin": base_url.rstrip('/'),
         "Referer": base_url
@@ -102,10 +104,10 @@ async def find_stream_from_servers_on_page(context: BrowserContext, page_url: st
         await page.goto(page_url, wait_until="domcontentloaded", timeout=60000)
         await page.wait_for_load_state('networkidle', timeout=DYNAMIC_WAIT_TIMEOUT)
 
-        for stream_url in reversed(candidate_urls):
-            if await verify_stream_url(session, stream_url, headers=verification_headers):
-                print(" ✔️ Found valid stream on initial page load.")
-                return stream_url
+        stream_url = await first_verified_url(checker, list(reversed(candidate_urls)), verification_headers)
+        if stream_url:
+            print(" ✔️ Found valid stream on initial page load.")
+            return stream_url
 
         print("  checking for server links on main page...")
         server_links_main = page.locator("#multistmb a")
@@ -127,10 +129,10 @@ async def find_stream_from_servers_on_page(context: BrowserContext, page_url: st
                 urls_after_click = set(candidate_urls)
                 new_urls = list(urls_after_click - urls_before_click)
 
-                for stream_url in reversed(new_urls):
-                    if await verify_stream_url(session, stream_url, headers=verification_headers):
-                        print(f" ✔️ Found valid stream after clicking main page link '{link_text}'.")
-                        return stream_url
+                stream_url = await first_verified_url(checker, list(reversed(new_urls)), verification_headers)
+                if stream_url:
+                    print(f" ✔️ Found valid stream after clicking main page link '{link_text}'.")
+                    return stream_url
             print("   - No valid streams found from main page links.")
         
         print(" checking for server links inside iframe (original style)...")
@@ -167,10 +169,10 @@ async def find_stream_from_servers_on_page(context: BrowserContext, page_url: st
                 urls_after_click = set(candidate_urls)
                 new_urls = list(urls_after_click - urls_before_click)
 
-                for stream_url in reversed(new_urls):
-                    if await verify_stream_url(session, stream_url, headers=verification_headers):
-                        print(f" ✔️ Found valid stream after clicking iframe link '{link_text}'.")
-                        return stream_url
+                stream_url = await first_verified_url(checker, list(reversed(new_urls)), verification_headers)
+                if stream_url:
+                    print(f" ✔️ Found valid stream after clicking iframe link '{link_text}'.")
+                    return stream_url
         else:
             print("   - No server links found inside iframe.")
 
@@ -189,7 +191,7 @@ async def scrape_league(base_url: str, channel_urls: List[str], group_prefix: st
     found_streams: Dict[str, Tuple[str, str, Optional[str]]] = {}
     results: List[Dict] = []
 
-    async with async_playwright() as p, aiohttp.ClientSession(headers={"User-Agent": USER_AGENT}) as session:
+    async with async_playwright() as p, StreamChecker(headers={"User-Agent": USER_AGENT}, deep=DEEP_CHECK) as checker:
         browser = await p.chromium.launch(headless=True)
         context = await browser.new_context(user_agent=USER_AGENT)
         try:
@@ -248,13 +250,13 @@ async def scrape_league(base_url: str, channel_urls: List[str], group_prefix: st
             await page.close()
 
             for game in game_links_info:
-                stream_url = await find_stream_from_servers_on_page(context, game["url"], base_url, session)
+                stream_url = await find_stream_from_servers_on_page(context, game["url"], base_url, checker)
                 if stream_url:
                     found_streams[game["name"]] = (stream_url, "Live Games", game["logo"])
 
             for url in channel_urls:
                 slug = url.strip("/").split("/")[-1]
-                stream_url = await find_stream_from_servers_on_page(context, url, base_url, session)
+                stream_url = await find_stream_from_servers_on_page(context, url, base_url, checker)
                 if stream_url:
                     found_streams[slug] = (stream_url, "24/7 Channels", None)
         except Exception as e:
@@ -282,9 +284,9 @@ async def scrape_nba_league(default_logo: str) -> List[Dict]:
     print(f"\nScraping NBAWebcast streams from {NBA_BASE_URL}...")
     results: List[Dict] = []
 
-    async with aiohttp.ClientSession(headers={"User-Agent": USER_AGENT}) as session:
+    async with StreamChecker(headers={"User-Agent": USER_AGENT}, deep=DEEP_CHECK) as checker:
         try:
-            async with session.get(NBA_BASE_URL, timeout=25) as response:
+            async with checker.session.get(NBA_BASE_URL, timeout=aiohttp.ClientTimeout(total=25)) as response:
                 response.raise_for_status()
                 html_content = await response.text()
         except Exception as e:
@@ -305,6 +307,7 @@ async def scrape_nba_league(default_logo: str) -> List[Dict]:
 
             print(f" 🏀 Found {len(game_rows)} potential NBA games in the schedule.")
             
+            games = []
             for row in game_rows:
                 watch_button = None
                 buttons = row.find_all("button", class_="watch_btn")
@@ -347,9 +350,11 @@ async def scrape_nba_league(default_logo: str) -> List[Dict]:
                      print(f" ⚠️ Could not find stream abbreviation for {game_name}. Skipping.")
                      continue
 
-                stream_url = NBA_STREAM_URL_PATTERN.format(stream_key=stream_key)
+                games.append((game_name, logo_to_use, NBA_STREAM_URL_PATTERN.format(stream_key=stream_key)))
 
-                if await verify_stream_url(session, stream_url, headers=NBA_CUSTOM_HEADERS):
+            checks = await checker.check_many([(stream_url, NBA_CUSTOM_HEADERS) for _, _, stream_url in games])
+            for (game_name, logo_to_use, stream_url), result in zip(games, checks):
+                if report_check(result):
                     results.append({
                         "name": game_name,
                         "url": stream_url,
@@ -369,7 +374,7 @@ def write_playlist(streams: List[Dict], filename: str):
     if not streams:
         print("⏹️ No streams found.")
         return
-    with open(filename, "w", encoding="utf-8") as f:
+    with PlaylistWriter(filename) as f:
         f.write("#EXTM3U\n")
         for entry in streams:
             f.write(f'#EXTINF:-1 tvg-id="{entry["tvg_id"]}" tvg-name="{entry["name"]}" tvg-logo="{entry["tvg_logo"]}" group-title="{entry["group"]}",{entry["name"]}\n')
@@ -383,7 +388,10 @@ def write_playlist(streams: List[Dict], filename: str):
                 f.write(f'#EXTVLCOPT:http-referrer={entry["ref"]}\n')
                 f.write(f"#EXTVLCOPT:http-user-agent={USER_AGENT}\n")
             f.write(entry["url"] + "\n")
-    print(f"✅ Playlist saved to {filename} ({len(streams)} streams).")
+    if f.changed:
+        print(f"✅ Playlist saved to {filename} ({len(streams)} streams).")
+    else:
+        print(f"⏸️ {filename} unchanged ({len(streams)} streams).")
 
 async def main():
     print("🚀 Starting Sports Webcast Scraper...")